@@ -0,0 +1,21 @@
+import time
+from datetime import datetime
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") for the last second formatted
+_second_cache = (-1, "")
+
+def fast_iso() -> str:
+    """Current local time in ISO 8601 with microseconds.
+    
+    The date/time part is formatted at most once per second and reused; only
+    the fractional part is computed per call.
+    """
+    global _second_cache
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    
+    cached_second, prefix = _second_cache
+    if seconds != cached_second:
+        prefix = datetime.fromtimestamp(seconds).strftime("%Y-%m-%dT%H:%M:%S")
+        _second_cache = (seconds, prefix)
+    
+    return f"{prefix}.{nanos // 1000:06d}"
@@ -1,53 +1,221 @@
 import sqlite3
 import aiosqlite
+import asyncio
 import json
-from datetime import datetime
-from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import Dict, Any, Optional, Set
 import logging
 import os
+import re
+from itertools import chain
+
+from clock import fast_iso
 
 logger = logging.getLogger(__name__)
 
+# Log rows are buffered and written by a background task in batches
+FLUSH_BATCH_SIZE = 256
+FLUSH_INTERVAL_S = 0.2
+
+# Rows per multi-row INSERT: 60 rows x 8 columns stays under SQLite's 999 bound-parameter limit
+INSERT_ROWS_PER_STATEMENT = 60
+_ROW_PLACEHOLDERS = "(?, ?, ?, ?, ?, ?, ?, ?)"
+
+# sqlite3 caches compiled statements per connection, so reusing these exact
+# strings on the persistent connection skips re-preparing them
+STATS_QUERY = """
+    SELECT
+        COUNT(*),
+        COALESCE(SUM(CASE WHEN crisis_detected THEN 1 ELSE 0 END), 0),
+        AVG(response_time_ms),
+        COALESCE(SUM(CASE WHEN datetime(timestamp) > datetime('now', '-1 day') THEN 1 ELSE 0 END), 0)
+    FROM conversations
+"""
+
+SENTIMENT_DISTRIBUTION_QUERY = """
+    SELECT sentiment_label, COUNT(*) as count 
+    FROM conversations 
+    GROUP BY sentiment_label
+"""
+
+class SentimentLabel(IntEnum):
+    """Storage codes for sentiment labels; the API keeps the string names"""
+    NEGATIVE = 0
+    NEUTRAL = 1
+    POSITIVE = 2
+
+_LABEL_CODES = {label.name.lower(): label.value for label in SentimentLabel}
+_LABEL_NAMES = {code: name for name, code in _LABEL_CODES.items()}
+
+# Rows live in append-only monthly tables (conversations_YYYYMM) unioned by
+# a `conversations` view, so retention is a DROP TABLE instead of a DELETE
+PARTITION_RE = re.compile(r"^conversations_\d{6}$")
+
+def _partition_name(dt: datetime) -> str:
+    return f"conversations_{dt:%Y%m}"
+
+def _next_month(dt: datetime) -> datetime:
+    return (dt.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+# Queue marker telling the flush loop to write what it has and exit
+_STOP = object()
+
 class ConversationLogger:
     def __init__(self, db_path: str = "conversations.db"):
         self.db_path = db_path
         self.initialized = False
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # Serializes writes on the shared connection: batched inserts, partition changes and cleanup
+        self._write_lock: Optional[asyncio.Lock] = None
+        # Makes concurrent first log_conversation calls share one initialization
+        self._init_lock: Optional[asyncio.Lock] = None
+        self._partitions: Set[str] = set()
+    
+    def _current_table(self) -> str:
+        """Partition that receives rows logged now"""
+        return _partition_name(datetime.now())
+    
+    async def _create_partition(self, table: str):
+        """Create a monthly partition table and its indexes"""
+        await self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                sentiment_score REAL,
+                sentiment_label INTEGER CHECK (sentiment_label IN (0, 1, 2)),
+                sentiment_confidence REAL,
+                crisis_detected BOOLEAN DEFAULT FALSE,
+                severity TEXT DEFAULT 'low',
+                response_time_ms INTEGER,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        await self._conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_conversation_id 
+            ON {table}(conversation_id)
+        """)
+        
+        await self._conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_timestamp 
+            ON {table}(timestamp)
+        """)
+        
+        await self._conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_crisis 
+            ON {table}(crisis_detected)
+        """)
+        
+        # Partitions from earlier versions carry an unused (timestamp, crisis_detected)
+        # index; the stats query scans the whole view, so it only slowed inserts
+        await self._conn.execute(f"DROP INDEX IF EXISTS idx_{table}_ts_crisis")
+        
+        self._partitions.add(table)
+    
+    async def _migrate_labels(self, table: str):
+        """Rewrite a partition that still stores sentiment labels as text"""
+        cursor = await self._conn.execute(f"PRAGMA table_info({table})")
+        columns = {row[1]: row[2] for row in await cursor.fetchall()}
+        if columns.get("sentiment_label") != "TEXT":
+            return
+        
+        # The renamed table keeps its index names, so free them for the new table
+        await self._conn.execute(f"ALTER TABLE {table} RENAME TO {table}_text")
+        for suffix in ("conversation_id", "timestamp", "crisis"):
+            await self._conn.execute(f"DROP INDEX IF EXISTS idx_{table}_{suffix}")
+        await self._create_partition(table)
+        
+        await self._conn.execute(f"""
+            INSERT INTO {table} (
+                id, conversation_id, timestamp, sentiment_score, 
+                sentiment_label, sentiment_confidence, crisis_detected, 
+                severity, response_time_ms, created_at
+            )
+            SELECT
+                id, conversation_id, timestamp, sentiment_score,
+                CASE sentiment_label
+                    WHEN 'negative' THEN {SentimentLabel.NEGATIVE.value}
+                    WHEN 'neutral' THEN {SentimentLabel.NEUTRAL.value}
+                    WHEN 'positive' THEN {SentimentLabel.POSITIVE.value}
+                END,
+                sentiment_confidence, crisis_detected, severity, response_time_ms, created_at
+            FROM {table}_text
+        """)
+        await self._conn.execute(f"DROP TABLE {table}_text")
+        await self._conn.commit()
+        logger.info(f"Converted sentiment labels in {table} to integer codes")
+    
+    async def _rebuild_view(self):
+        """Point the `conversations` view at the current set of partitions"""
+        await self._conn.execute("DROP VIEW IF EXISTS conversations")
+        union = " UNION ALL ".join(
+            f"SELECT * FROM {table}" for table in sorted(self._partitions)
+        )
+        await self._conn.execute(f"CREATE VIEW conversations AS {union}")
+        await self._conn.commit()
     
     async def initialize(self):
         """Initialize the database and create tables"""
+        if self.initialized:
+            return
+        
+        # Created on first use, inside the running loop; no await between the check and the set
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        
+        async with self._init_lock:
+            # Another caller may have finished while this one waited
+            if not self.initialized:
+                await self._initialize()
+    
+    async def _initialize(self):
+        """Open the connection, bring the schema up to date and start the flush loop"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS conversations (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        conversation_id TEXT NOT NULL,
-                        timestamp TEXT NOT NULL,
-                        sentiment_score REAL,
-                        sentiment_label TEXT,
-                        sentiment_confidence REAL,
-                        crisis_detected BOOLEAN DEFAULT FALSE,
-                        severity TEXT DEFAULT 'low',
-                        response_time_ms INTEGER,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_conversation_id 
-                    ON conversations(conversation_id)
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_timestamp 
-                    ON conversations(timestamp)
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_crisis 
-                    ON conversations(crisis_detected)
-                """)
-                
-                await db.commit()
+            self._conn = await aiosqlite.connect(self.db_path)
+            await self._conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-8000;
+            """)
+            
+            # Databases from before partitioning have a plain `conversations` table;
+            # adopt it as the current month so its rows stay visible in the view
+            cursor = await self._conn.execute(
+                "SELECT type FROM sqlite_master WHERE name = 'conversations'"
+            )
+            existing = await cursor.fetchone()
+            if existing and existing[0] == "table":
+                await self._conn.execute(
+                    f"ALTER TABLE conversations RENAME TO {self._current_table()}"
+                )
+            
+            cursor = await self._conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+            self._partitions = {
+                name for (name,) in await cursor.fetchall() if PARTITION_RE.match(name)
+            }
+            
+            # Older partitions stored labels as text; the view is rebuilt below
+            await self._conn.execute("DROP VIEW IF EXISTS conversations")
+            for table in sorted(self._partitions):
+                await self._migrate_labels(table)
+            
+            now = datetime.now()
+            await self._create_partition(_partition_name(now))
+            await self._create_partition(_partition_name(_next_month(now)))
+            await self._rebuild_view()
+            
+            self._write_lock = asyncio.Lock()
+            
+            # Created here rather than in __init__ so the queue binds to the running loop
+            self._queue = asyncio.Queue()
+            self._flush_task = asyncio.create_task(self._flush_loop())
             
             self.initialized = True
             logger.info(f"Database initialized at {self.db_path}")
@@ -55,6 +223,10 @@ class ConversationLogger:
         except Exception as e:
             logger.error(f"Database initialization failed: {e}")
             self.initialized = False
+            # A later call retries with a fresh connection
+            if self._conn:
+                await self._conn.close()
+                self._conn = None
     
     async def log_conversation(
         self,
@@ -64,33 +236,88 @@ class ConversationLogger:
         severity: str = "low",
         response_time_ms: Optional[int] = None
     ):
-        """Log conversation metadata (anonymized)"""
+        """Queue conversation metadata (anonymized) for the next batched write"""
         if not self.initialized:
             await self.initialize()
+            if not self.initialized:
+                return
         
-        try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO conversations (
-                        conversation_id, timestamp, sentiment_score, 
-                        sentiment_label, sentiment_confidence, crisis_detected, 
-                        severity, response_time_ms
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    conversation_id,
-                    datetime.now().isoformat(),
-                    sentiment.get("score", 0.0),
-                    sentiment.get("label", "neutral"),
-                    sentiment.get("confidence", 0.0),
-                    crisis_detected,
-                    severity,
-                    response_time_ms
-                ))
+        self._queue.put_nowait((
+            conversation_id,
+            fast_iso(),
+            sentiment.get("score", 0.0),
+            _LABEL_CODES.get(sentiment.get("label"), SentimentLabel.NEUTRAL.value),
+            sentiment.get("confidence", 0.0),
+            crisis_detected,
+            severity,
+            response_time_ms
+        ))
+    
+    async def _flush_loop(self):
+        """Write queued rows every FLUSH_INTERVAL_S or FLUSH_BATCH_SIZE rows"""
+        while True:
+            rows = []
+            item = await self._queue.get()
+            
+            if item is not _STOP:
+                rows.append(item)
+                if self._queue.qsize() < FLUSH_BATCH_SIZE - 1:
+                    await asyncio.sleep(FLUSH_INTERVAL_S)
                 
-                await db.commit()
+                while len(rows) < FLUSH_BATCH_SIZE and not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is _STOP:
+                        break
+                    rows.append(item)
             
-        except Exception as e:
-            logger.error(f"Failed to log conversation: {e}")
+            if rows:
+                await self._write_rows(rows)
+            
+            if item is _STOP:
+                return
+    
+    async def _write_rows(self, rows):
+        """Insert a batch of rows in a single transaction"""
+        # Held across the whole transaction so cleanup can't commit or drop tables mid-batch
+        async with self._write_lock:
+            try:
+                table = self._current_table()
+                if table not in self._partitions:
+                    await self._create_partition(table)
+                    await self._rebuild_view()
+                
+                # Take the database write lock up front rather than upgrading mid-transaction
+                await self._conn.execute("BEGIN IMMEDIATE")
+                for start in range(0, len(rows), INSERT_ROWS_PER_STATEMENT):
+                    chunk = rows[start:start + INSERT_ROWS_PER_STATEMENT]
+                    values = ", ".join([_ROW_PLACEHOLDERS] * len(chunk))
+                    await self._conn.execute(f"""
+                        INSERT INTO {table} (
+                            conversation_id, timestamp, sentiment_score, 
+                            sentiment_label, sentiment_confidence, crisis_detected, 
+                            severity, response_time_ms
+                        ) VALUES {values}
+                    """, list(chain.from_iterable(chunk)))
+                
+                await self._conn.commit()
+                
+            except Exception as e:
+                logger.error(f"Failed to log {len(rows)} conversations: {e}")
+                if self._conn.in_transaction:
+                    await self._conn.rollback()
+    
+    async def aclose(self):
+        """Flush pending rows and close the database connection"""
+        if self._flush_task:
+            self._queue.put_nowait(_STOP)
+            await self._flush_task
+            self._flush_task = None
+        
+        if self._conn:
+            await self._conn.close()
+            self._conn = None
+        
+        self.initialized = False
     
     async def get_stats(self) -> Dict[str, Any]:
         """Get anonymized conversation statistics"""
@@ -98,68 +325,56 @@ class ConversationLogger:
             return {"error": "Database not initialized"}
         
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                # Total conversations
-                cursor = await db.execute("SELECT COUNT(*) FROM conversations")
-                total_conversations = (await cursor.fetchone())[0]
-                
-                # Crisis events
-                cursor = await db.execute(
-                    "SELECT COUNT(*) FROM conversations WHERE crisis_detected = TRUE"
-                )
-                crisis_count = (await cursor.fetchone())[0]
-                
-                # Sentiment distribution
-                cursor = await db.execute("""
-                    SELECT sentiment_label, COUNT(*) as count 
-                    FROM conversations 
-                    GROUP BY sentiment_label
-                """)
-                sentiment_dist = dict(await cursor.fetchall())
-                
-                # Average response time
-                cursor = await db.execute("""
-                    SELECT AVG(response_time_ms) 
-                    FROM conversations 
-                    WHERE response_time_ms IS NOT NULL
-                """)
-                avg_response_time = (await cursor.fetchone())[0]
-                
-                # Recent activity (last 24 hours)
-                cursor = await db.execute("""
-                    SELECT COUNT(*) FROM conversations 
-                    WHERE datetime(timestamp) > datetime('now', '-1 day')
-                """)
-                recent_activity = (await cursor.fetchone())[0]
-                
-                return {
-                    "total_conversations": total_conversations,
-                    "crisis_events": crisis_count,
-                    "crisis_rate": crisis_count / max(total_conversations, 1) * 100,
-                    "sentiment_distribution": sentiment_dist,
-                    "avg_response_time_ms": avg_response_time,
-                    "recent_activity_24h": recent_activity,
-                    "last_updated": datetime.now().isoformat()
-                }
+            # One pass over the table for every scalar aggregate
+            cursor = await self._conn.execute(STATS_QUERY)
+            total_conversations, crisis_count, avg_response_time, recent_activity = await cursor.fetchone()
+            
+            # Sentiment distribution, with the stored codes mapped back to names
+            cursor = await self._conn.execute(SENTIMENT_DISTRIBUTION_QUERY)
+            sentiment_dist = {
+                _LABEL_NAMES.get(code, code): count for code, count in await cursor.fetchall()
+            }
+            
+            return {
+                "total_conversations": total_conversations,
+                "crisis_events": crisis_count,
+                "crisis_rate": crisis_count / max(total_conversations, 1) * 100,
+                "sentiment_distribution": sentiment_dist,
+                "avg_response_time_ms": avg_response_time,
+                "recent_activity_24h": recent_activity,
+                "last_updated": datetime.now().isoformat()
+            }
                 
         except Exception as e:
             logger.error(f"Failed to get stats: {e}")
             return {"error": str(e)}
     
     async def cleanup_old_data(self, days_to_keep: int = 30):
-        """Clean up old conversation logs for privacy"""
+        """Clean up old conversation logs for privacy
+        
+        Retention drops whole monthly partitions, so rows are kept until every
+        row in their month is older than `days_to_keep`.
+        """
         if not self.initialized:
             return
         
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    DELETE FROM conversations 
-                    WHERE datetime(timestamp) < datetime('now', '-{} days')
-                """.format(days_to_keep))
+            cutoff = _partition_name(datetime.now() - timedelta(days=days_to_keep))
+            
+            async with self._write_lock:
+                expired = {table for table in self._partitions if table < cutoff}
+                if not expired:
+                    return
+                
+                # The view must not reference a table while it is dropped
+                await self._conn.execute("DROP VIEW IF EXISTS conversations")
+                for table in sorted(expired):
+                    await self._conn.execute(f"DROP TABLE IF EXISTS {table}")
                 
-                await db.commit()
-                logger.info(f"Cleaned up conversations older than {days_to_keep} days")
+                self._partitions -= expired
+                await self._rebuild_view()
+            
+            logger.info(f"Dropped {len(expired)} conversation partitions older than {days_to_keep} days")
                 
         except Exception as e:
             logger.error(f"Failed to cleanup old data: {e}")
\ No newline at end of file
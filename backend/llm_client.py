@@ -1,6 +1,6 @@
 import os
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,21 +19,36 @@ SYSTEM_PROMPT = """You are an empathetic and non-judgmental mental-wellness assi
 
 Keep responses under 120 words and always be warm, understanding, and supportive."""
 
+GEMINI_MODEL = "gemini-1.5-flash"  # gemini-pro doesn't accept a system instruction
+
+# Fixed pieces of the per-request context built by LLMClient._build_context
+_HISTORY_HEADER = "Recent conversation:"
+_CURRENT_MESSAGE = "\nCurrent user message: {message}"
+_DETECTED_SENTIMENT = "Detected sentiment: {label} (confidence: {confidence:.2f})"
+_NEGATIVE_NOTE = "\nNote: User seems to be experiencing negative emotions. Provide extra validation and gentle coping suggestions."
+_CONTEXT_TAIL = "\nProvide a supportive, empathetic response following the system guidelines:"
+
 class LLMClient:
     def __init__(self):
         self.openai_client = None
         self.gemini_client = None
         self.anthropic_client = None
+        self._http = None
         self._initialize_clients()
     
     def _initialize_clients(self):
         """Initialize available LLM clients"""
+        # One keep-alive HTTP/2 pool shared by the OpenAI and Anthropic SDKs
+        if os.getenv("OPENAI_API_KEY") or os.getenv("ANTHROPIC_API_KEY"):
+            self._http = self._build_http_client()
+        
         # OpenAI
         if os.getenv("OPENAI_API_KEY"):
             try:
                 import openai
                 self.openai_client = openai.AsyncOpenAI(
-                    api_key=os.getenv("OPENAI_API_KEY")
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=self._http
                 )
                 logger.info("OpenAI client initialized")
             except Exception as e:
@@ -44,7 +59,10 @@ class LLMClient:
             try:
                 import google.generativeai as genai
                 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-                self.gemini_client = genai.GenerativeModel('gemini-pro')
+                self.gemini_client = genai.GenerativeModel(
+                    GEMINI_MODEL,
+                    system_instruction=SYSTEM_PROMPT
+                )
                 logger.info("Gemini client initialized")
             except Exception as e:
                 logger.warning(f"Gemini initialization failed: {e}")
@@ -54,7 +72,8 @@ class LLMClient:
             try:
                 import anthropic
                 self.anthropic_client = anthropic.AsyncAnthropic(
-                    api_key=os.getenv("ANTHROPIC_API_KEY")
+                    api_key=os.getenv("ANTHROPIC_API_KEY"),
+                    http_client=self._http
                 )
                 logger.info("Anthropic client initialized")
             except Exception as e:
@@ -63,6 +82,25 @@ class LLMClient:
         if not any([self.openai_client, self.gemini_client, self.anthropic_client]):
             logger.error("No LLM clients initialized. Please provide at least one API key.")
     
+    def _build_http_client(self):
+        """Create the shared HTTP client, or None to let each SDK use its own"""
+        try:
+            import httpx
+            return httpx.AsyncClient(
+                http2=True,
+                timeout=30,
+                limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=60)
+            )
+        except Exception as e:
+            logger.warning(f"Shared HTTP client initialization failed: {e}")
+            return None
+    
+    async def aclose(self):
+        """Close the shared HTTP connection pool"""
+        if self._http:
+            await self._http.aclose()
+            self._http = None
+    
     async def generate_response(
         self, 
         current_message: str, 
@@ -88,6 +126,45 @@ class LLMClient:
             logger.error(f"LLM generation failed: {e}")
             return self._fallback_response(sentiment)
     
+    async def generate_response_stream(
+        self, 
+        current_message: str, 
+        conversation_history: List[Dict], 
+        sentiment: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """Yield the response in chunks as the LLM produces it"""
+        yielded = False
+        try:
+            context = self._build_context(current_message, conversation_history, sentiment)
+            
+            if self.openai_client:
+                chunks = self._stream_with_openai(context)
+            elif self.anthropic_client:
+                chunks = self._stream_with_anthropic(context)
+            elif self.gemini_client:
+                # No async streaming for Gemini; send the whole reply as one chunk
+                chunks = self._single_chunk(self._generate_with_gemini(context))
+            else:
+                yield self._fallback_response(sentiment)
+                return
+            
+            async for chunk in chunks:
+                yielded = True
+                yield chunk
+            
+        except Exception as e:
+            logger.error(f"LLM streaming failed: {e}")
+            # The fallback can stand in for a whole reply, not finish a partial one
+            if yielded:
+                raise
+        
+        if not yielded:
+            yield self._fallback_response(sentiment)
+    
+    async def _single_chunk(self, response) -> AsyncIterator[str]:
+        """Wrap a non-streaming generation as a one-chunk stream"""
+        yield await response
+    
     def _build_context(
         self, 
         current_message: str, 
@@ -95,26 +172,22 @@ class LLMClient:
         sentiment: Dict[str, Any]
     ) -> str:
         """Build context for the LLM"""
-        context_parts = []
+        history_lines = [
+            f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+            for msg in conversation_history[-4:]  # Last 4 messages
+        ]
         
-        # Add conversation history
-        if conversation_history:
-            context_parts.append("Recent conversation:")
-            for msg in conversation_history[-4:]:  # Last 4 messages
-                role = "User" if msg["role"] == "user" else "Assistant"
-                context_parts.append(f"{role}: {msg['content']}")
-        
-        # Add current message and sentiment
-        context_parts.append(f"\nCurrent user message: {current_message}")
-        context_parts.append(f"Detected sentiment: {sentiment.get('label', 'neutral')} (confidence: {sentiment.get('confidence', 0.5):.2f})")
-        
-        # Add specific guidance based on sentiment
-        if sentiment.get('score', 0) < -0.3:
-            context_parts.append("\nNote: User seems to be experiencing negative emotions. Provide extra validation and gentle coping suggestions.")
-        
-        context_parts.append("\nProvide a supportive, empathetic response following the system guidelines:")
-        
-        return "\n".join(context_parts)
+        return "\n".join((
+            *((_HISTORY_HEADER, *history_lines) if history_lines else ()),
+            _CURRENT_MESSAGE.format(message=current_message),
+            _DETECTED_SENTIMENT.format(
+                label=sentiment.get('label', 'neutral'),
+                confidence=sentiment.get('confidence', 0.5)
+            ),
+            # Specific guidance based on sentiment
+            *((_NEGATIVE_NOTE,) if sentiment.get('score', 0) < -0.3 else ()),
+            _CONTEXT_TAIL
+        ))
     
     async def _generate_with_openai(self, context: str) -> str:
         """Generate response using OpenAI"""
@@ -139,8 +212,9 @@ class LLMClient:
             response = await self.anthropic_client.messages.create(
                 model="claude-3-haiku-20240307",
                 max_tokens=150,
+                system=SYSTEM_PROMPT,
                 messages=[
-                    {"role": "user", "content": f"{SYSTEM_PROMPT}\n\n{context}"}
+                    {"role": "user", "content": context}
                 ],
                 temperature=0.7
             )
@@ -149,13 +223,41 @@ class LLMClient:
             logger.error(f"Anthropic generation failed: {e}")
             raise
     
+    async def _stream_with_openai(self, context: str) -> AsyncIterator[str]:
+        """Stream response chunks from OpenAI"""
+        stream = await self.openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": context}
+            ],
+            max_tokens=150,
+            temperature=0.7,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def _stream_with_anthropic(self, context: str) -> AsyncIterator[str]:
+        """Stream response chunks from Anthropic Claude"""
+        async with self.anthropic_client.messages.stream(
+            model="claude-3-haiku-20240307",
+            max_tokens=150,
+            system=SYSTEM_PROMPT,
+            messages=[
+                {"role": "user", "content": context}
+            ],
+            temperature=0.7
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+    
     async def _generate_with_gemini(self, context: str) -> str:
         """Generate response using Google Gemini"""
         try:
-            full_prompt = f"{SYSTEM_PROMPT}\n\n{context}"
-            
             def _sync_generate():
-                response = self.gemini_client.generate_content(full_prompt)
+                response = self.gemini_client.generate_content(context)
                 return response.text
             
             # Run in thread pool
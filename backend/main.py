@@ -1,21 +1,61 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Set, Annotated
 import os
-from datetime import datetime
+import time
+import asyncio
+from collections import deque
+from weakref import WeakValueDictionary
 import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import msgpack
+import orjson
+from cachetools import TTLCache
 
 from nlp import SentimentAnalyzer
 from llm_client import LLMClient
 from safety import CrisisDetector, get_crisis_response
 from db import ConversationLogger
+from clock import fast_iso
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="MindMate API", description="Mental Health Support Chatbot API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize database and services, then flush and close them on shutdown"""
+    if logger_db:
+        await logger_db.initialize()
+    
+    # One throwaway inference so the first chat doesn't pay for model warmup
+    if sentiment_analyzer.hf_pipeline:
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, sentiment_analyzer.hf_pipeline, ["warmup"])
+        except Exception as e:
+            logger.warning(f"Sentiment model warmup failed: {e}")
+    
+    logger.info("MindMate API started successfully")
+    yield
+    
+    if background_tasks:
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+    if logger_db:
+        await logger_db.aclose()
+    await llm_client.aclose()
+
+app = FastAPI(
+    title="MindMate API",
+    description="Mental Health Support Chatbot API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
 
 # CORS middleware
 app.add_middleware(
@@ -34,27 +74,91 @@ logger_db = ConversationLogger() if os.getenv("ENABLE_LOGGING", "").lower() == "
 
 # Pydantic models
 class ChatRequest(BaseModel):
-    message: str
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+    
+    message: Annotated[str, Field(min_length=1, max_length=4000)]
     conversation_id: Optional[str] = None
     user_id: Optional[str] = "anonymous"
 
+class ChatBatchRequest(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, extra="ignore")
+    
+    messages: Annotated[List[Annotated[str, Field(min_length=1, max_length=4000)]], Field(min_length=1, max_length=20)]
+    conversation_id: Optional[str] = None
+    user_id: Optional[str] = "anonymous"
+
+class Sentiment(BaseModel):
+    provider: str
+    score: float
+    magnitude: Optional[float] = None
+    label: str
+    confidence: float
+
+# Documents /chat; the endpoint builds the JSON directly rather than validating its own output
 class ChatResponse(BaseModel):
     response: str
-    sentiment: dict
+    sentiment: Sentiment
     crisis_detected: bool
     timestamp: str
     conversation_id: str
     resources: Optional[List[str]] = None
 
-# In-memory conversation storage (for demo purposes)
-conversations = {}
+class ChatBatchResponse(BaseModel):
+    responses: List[ChatResponse]
 
-@app.on_startup
-async def startup_event():
-    """Initialize database and services"""
-    if logger_db:
-        await logger_db.initialize()
-    logger.info("MindMate API started successfully")
+# In-memory conversation storage (for demo purposes), bounded and evicted after an hour idle
+MAX_HISTORY_MESSAGES = 6  # 3 exchanges
+conversations = TTLCache(maxsize=10_000, ttl=3600)
+
+# Each stored message is a msgpack blob of (role code, content, epoch milliseconds)
+ROLE_USER = 0
+ROLE_ASSISTANT = 1
+_ROLE_NAMES = ("user", "assistant")
+
+def _pack_message(role: int, content: str, timestamp_ms: int) -> bytes:
+    return msgpack.packb((role, content, timestamp_ms), use_bin_type=True)
+
+def _unpack_message(blob: bytes) -> dict:
+    role, content, timestamp_ms = msgpack.unpackb(blob)
+    return {
+        "role": _ROLE_NAMES[role],
+        "content": content,
+        "timestamp": datetime.fromtimestamp(timestamp_ms / 1000).isoformat(timespec="milliseconds")
+    }
+
+CRISIS_RESOURCES = [
+    "National Suicide Prevention Lifeline: 988",
+    "Crisis Text Line: Text HOME to 741741",
+    "Emergency Services: 911",
+    "Find local mental health resources at SAMHSA.gov"
+]
+
+SUPPORT_RESOURCES = [
+    "National Alliance on Mental Illness (NAMI): nami.org",
+    "Mental Health America: mhanational.org",
+    "Psychology Today therapist finder"
+]
+
+# Reported for crisis messages instead of running sentiment analysis
+CRISIS_SENTIMENT = {
+    "provider": "bypass",
+    "score": -1.0,
+    "magnitude": 1.0,
+    "label": "negative",
+    "confidence": 1.0
+}
+
+# Serializes turns within a conversation; a lock lives only while a request holds it
+conversation_locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+
+# Fire-and-forget log writes, referenced here until they finish so they aren't collected
+background_tasks: Set[asyncio.Task] = set()
+
+def _log_in_background(**kwargs):
+    """Log a conversation without holding up the response"""
+    task = asyncio.create_task(logger_db.log_conversation(**kwargs))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
 
 @app.get("/")
 async def root():
@@ -62,112 +166,186 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": fast_iso()}
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
-        timestamp = datetime.now().isoformat()
+        timestamp = fast_iso()
         conversation_id = request.conversation_id or f"conv_{timestamp}"
         
-        # Get or create conversation history
-        if conversation_id not in conversations:
-            conversations[conversation_id] = []
+        lock = conversation_locks.setdefault(conversation_id, asyncio.Lock())
+        async with lock:
+            return ORJSONResponse(await _chat_turn(request, conversation_id, timestamp))
         
-        conversation_history = conversations[conversation_id]
-        
-        # Add user message to history
-        conversation_history.append({
-            "role": "user",
-            "content": request.message,
-            "timestamp": timestamp
-        })
+    except Exception as e:
+        logger.error(f"Error in chat endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+def _start_turn(request: ChatRequest, conversation_id: str):
+    """Record the user's message; returns the conversation history and the turn's time"""
+    # Get or create conversation history; older messages fall off the bounded deque
+    conversation_history = conversations.get(conversation_id)
+    if conversation_history is None:
+        conversation_history = deque(maxlen=MAX_HISTORY_MESSAGES)
+    
+    # Reassign so the idle TTL restarts with each turn
+    conversations[conversation_id] = conversation_history
+    
+    # Add user message to history
+    timestamp_ms = time.time_ns() // 1_000_000
+    conversation_history.append(_pack_message(ROLE_USER, request.message, timestamp_ms))
+    return conversation_history, timestamp_ms
+
+def _log_turn(conversation_id: str, sentiment: dict, crisis_detected: bool):
+    """Log the turn's metadata (anonymized), if logging is enabled"""
+    if not logger_db:
+        return
+    
+    if crisis_detected:
+        severity = "high"
+    elif sentiment.get("score", 0) < -0.5:
+        severity = "medium"
+    else:
+        severity = "low"
+    
+    _log_in_background(
+        conversation_id=conversation_id,
+        sentiment=sentiment,
+        crisis_detected=crisis_detected,
+        severity=severity
+    )
+
+async def _analyze_turn(request: ChatRequest, conversation_history: deque):
+    """Sentiment for the message and the recent messages for the LLM context"""
+    sentiment = await sentiment_analyzer.analyze(request.message)
+    recent_messages = [_unpack_message(blob) for blob in list(conversation_history)[-3:]]  # Last 3 messages
+    return sentiment, recent_messages
+
+async def _chat_turn(request: ChatRequest, conversation_id: str, timestamp: str) -> dict:
+    """Run one chat exchange while holding the conversation's lock; returns the /chat fields"""
+    conversation_history, timestamp_ms = _start_turn(request, conversation_id)
+    
+    # Check for crisis first - the crisis path doesn't need the sentiment model
+    crisis_detected = crisis_detector.detect_crisis(request.message)
+    
+    if crisis_detected:
+        # Return crisis response immediately
+        sentiment = dict(CRISIS_SENTIMENT)
+        _log_turn(conversation_id, sentiment, crisis_detected=True)
         
-        # Keep only last 6 messages (3 exchanges) to manage context
-        if len(conversation_history) > 6:
-            conversation_history = conversation_history[-6:]
-            conversations[conversation_id] = conversation_history
+        return {
+            "response": get_crisis_response(),
+            "sentiment": sentiment,
+            "crisis_detected": True,
+            "timestamp": timestamp,
+            "conversation_id": conversation_id,
+            "resources": CRISIS_RESOURCES
+        }
+    
+    sentiment, recent_messages = await _analyze_turn(request, conversation_history)
+    
+    # Generate empathetic response using LLM
+    response_text = await llm_client.generate_response(
+        current_message=request.message,
+        conversation_history=recent_messages,
+        sentiment=sentiment
+    )
+    
+    # Add assistant response to history
+    conversation_history.append(_pack_message(ROLE_ASSISTANT, response_text, timestamp_ms))
+    _log_turn(conversation_id, sentiment, crisis_detected=False)
+    
+    return {
+        "response": response_text,
+        "sentiment": sentiment,
+        "crisis_detected": False,
+        "timestamp": timestamp,
+        "conversation_id": conversation_id,
+        "resources": SUPPORT_RESOURCES
+    }
+
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(request: ChatBatchRequest):
+    """Answer several messages of one conversation in order, in a single request"""
+    try:
+        timestamp = fast_iso()
+        conversation_id = request.conversation_id or f"conv_{timestamp}"
         
-        # Analyze sentiment
-        sentiment = await sentiment_analyzer.analyze(request.message)
+        lock = conversation_locks.setdefault(conversation_id, asyncio.Lock())
+        async with lock:
+            # Each turn sees the ones before it, so they run one after another
+            responses = []
+            for message in request.messages:
+                turn = ChatRequest(message=message, conversation_id=conversation_id, user_id=request.user_id)
+                responses.append(await _chat_turn(turn, conversation_id, fast_iso()))
         
-        # Check for crisis
-        crisis_detected = crisis_detector.detect_crisis(request.message)
+        return ORJSONResponse({"responses": responses})
         
-        if crisis_detected:
-            # Return crisis response immediately
-            response_text = get_crisis_response()
-            resources = [
-                "National Suicide Prevention Lifeline: 988",
-                "Crisis Text Line: Text HOME to 741741",
-                "Emergency Services: 911",
-                "Find local mental health resources at SAMHSA.gov"
-            ]
+    except Exception as e:
+        logger.error(f"Error in chat batch endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the reply as server-sent events: token frames, then one done frame with the /chat fields"""
+    timestamp = fast_iso()
+    conversation_id = request.conversation_id or f"conv_{timestamp}"
+    
+    return StreamingResponse(
+        _chat_events(request, conversation_id, timestamp),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _sse(event: dict) -> bytes:
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+async def _chat_events(request: ChatRequest, conversation_id: str, timestamp: str):
+    """Run one chat exchange, yielding SSE frames as the response is generated"""
+    try:
+        lock = conversation_locks.setdefault(conversation_id, asyncio.Lock())
+        async with lock:
+            conversation_history, timestamp_ms = _start_turn(request, conversation_id)
+            crisis_detected = crisis_detector.detect_crisis(request.message)
             
-            # Log crisis event (anonymized)
-            if logger_db:
-                await logger_db.log_conversation(
-                    conversation_id=conversation_id,
-                    sentiment=sentiment,
-                    crisis_detected=True,
-                    severity="high"
-                )
+            if crisis_detected:
+                sentiment = dict(CRISIS_SENTIMENT)
+                response_text = get_crisis_response()
+                resources = CRISIS_RESOURCES
+                yield _sse({"type": "token", "content": response_text})
+            else:
+                sentiment, recent_messages = await _analyze_turn(request, conversation_history)
+                
+                chunks = []
+                async for chunk in llm_client.generate_response_stream(
+                    current_message=request.message,
+                    conversation_history=recent_messages,
+                    sentiment=sentiment
+                ):
+                    chunks.append(chunk)
+                    yield _sse({"type": "token", "content": chunk})
+                
+                # History only records replies that were streamed to the end
+                response_text = "".join(chunks).strip()
+                conversation_history.append(_pack_message(ROLE_ASSISTANT, response_text, timestamp_ms))
+                resources = SUPPORT_RESOURCES
             
-            return ChatResponse(
-                response=response_text,
-                sentiment=sentiment,
-                crisis_detected=True,
-                timestamp=timestamp,
-                conversation_id=conversation_id,
-                resources=resources
-            )
+            _log_turn(conversation_id, sentiment, crisis_detected)
         
-        # Generate empathetic response using LLM
-        recent_messages = conversation_history[-3:]  # Last 3 messages
-        response_text = await llm_client.generate_response(
-            current_message=request.message,
-            conversation_history=recent_messages,
-            sentiment=sentiment
-        )
-        
-        # Add assistant response to history
-        conversation_history.append({
-            "role": "assistant", 
-            "content": response_text,
-            "timestamp": timestamp
+        yield _sse({
+            "type": "done",
+            "response": response_text,
+            "sentiment": sentiment,
+            "crisis_detected": crisis_detected,
+            "timestamp": timestamp,
+            "conversation_id": conversation_id,
+            "resources": resources
         })
         
-        # Log conversation (anonymized)
-        if logger_db:
-            severity = "low"
-            if sentiment.get("score", 0) < -0.5:
-                severity = "medium"
-            
-            await logger_db.log_conversation(
-                conversation_id=conversation_id,
-                sentiment=sentiment,
-                crisis_detected=False,
-                severity=severity
-            )
-        
-        resources = [
-            "National Alliance on Mental Illness (NAMI): nami.org",
-            "Mental Health America: mhanational.org",
-            "Psychology Today therapist finder"
-        ]
-        
-        return ChatResponse(
-            response=response_text,
-            sentiment=sentiment,
-            crisis_detected=False,
-            timestamp=timestamp,
-            conversation_id=conversation_id,
-            resources=resources
-        )
-        
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+        logger.error(f"Error in chat stream: {str(e)}")
+        yield _sse({"type": "error", "detail": "Internal server error"})
 
 @app.get("/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
@@ -177,7 +355,16 @@ async def get_conversation(conversation_id: str):
     
     return {
         "conversation_id": conversation_id,
-        "history": conversations[conversation_id]
+        "history": [_unpack_message(blob) for blob in conversations[conversation_id]]
+    }
+
+@app.get("/session/bootstrap")
+async def session_bootstrap(conversation_id: Optional[str] = None):
+    """Health and the conversation's stats in one request, for the frontend sidebar"""
+    history = conversations.get(conversation_id) if conversation_id else None
+    return {
+        "health": await health_check(),
+        "stats": {"message_count": len(history)} if history is not None else None
     }
 
 @app.delete("/conversations/{conversation_id}")
@@ -191,8 +378,16 @@ async def clear_conversation(conversation_id: str):
 
 if __name__ == "__main__":
     import uvicorn
+    
+    # Conversation history lives in process memory, so workers don't share it
+    workers = int(os.getenv("WORKERS", "1"))
     uvicorn.run(
-        app, 
+        "main:app" if workers > 1 else app,
         host=os.getenv("API_HOST", "0.0.0.0"), 
-        port=int(os.getenv("API_PORT", "8000"))
+        port=int(os.getenv("API_PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+        log_level="warning",
+        access_log=False
     )
\ No newline at end of file
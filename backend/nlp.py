@@ -1,14 +1,45 @@
 import os
+import re
 import asyncio
-from typing import Dict, Any
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
+from cachetools import LRUCache
+
 logger = logging.getLogger(__name__)
 
+# Vocabulary for the rule-based fallback, matched against whole words
+_POSITIVE_WORDS = frozenset({
+    "good", "great", "happy", "joy", "love", "wonderful", "amazing",
+    "excellent", "fantastic", "perfect", "awesome", "brilliant"
+})
+_NEGATIVE_WORDS = frozenset({
+    "bad", "terrible", "sad", "angry", "hate", "awful", "horrible",
+    "depressed", "anxious", "worried", "scared", "lonely", "hopeless",
+    "suicide", "kill", "die", "hurt", "pain"
+})
+
+# Text with no word tokens at all skips the providers
+_TOKEN_RE = re.compile(r"[a-z']+")
+
+# Results for recently seen messages, keyed by a hash of the normalized text
+SENTIMENT_CACHE_SIZE = 2048
+
+HF_SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+
+# Concurrent HuggingFace requests arriving within the window share one pipeline call
+HF_BATCH_WINDOW_S = 0.01
+HF_MAX_BATCH_SIZE = 16
+
 class SentimentAnalyzer:
     def __init__(self):
         self.google_client = None
         self.hf_pipeline = None
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._batch_task: Optional[asyncio.Task] = None
+        self._cache: LRUCache = LRUCache(maxsize=SENTIMENT_CACHE_SIZE)
+        self._in_flight: Dict[bytes, asyncio.Future] = {}
         self._initialize_services()
     
     def _initialize_services(self):
@@ -23,13 +54,43 @@ class SentimentAnalyzer:
             except Exception as e:
                 logger.warning(f"Google Cloud NLP initialization failed: {e}")
         
+        # Int8-quantized ONNX export of the HuggingFace model, if one is configured
+        if not self.google_client and os.getenv("SENTIMENT_ONNX_DIR"):
+            try:
+                import onnxruntime
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+                from optimum.pipelines import pipeline
+                from transformers import AutoTokenizer
+                
+                model_dir = os.getenv("SENTIMENT_ONNX_DIR")
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = 1  # Batching already amortizes per-call cost
+                
+                model = ORTModelForSequenceClassification.from_pretrained(
+                    model_dir,
+                    file_name="model_quantized.onnx",
+                    provider="CPUExecutionProvider",
+                    session_options=session_options
+                )
+                self.hf_pipeline = pipeline(
+                    "sentiment-analysis",
+                    model=model,
+                    tokenizer=AutoTokenizer.from_pretrained(model_dir),
+                    accelerator="ort",
+                    return_all_scores=True
+                )
+                logger.info("Quantized ONNX sentiment pipeline initialized")
+            except Exception as e:
+                logger.warning(f"ONNX sentiment model initialization failed: {e}")
+                self.hf_pipeline = None
+        
         # Fallback to HuggingFace
-        if not self.google_client:
+        if not self.google_client and not self.hf_pipeline:
             try:
                 from transformers import pipeline
                 self.hf_pipeline = pipeline(
                     "sentiment-analysis",
-                    model="distilbert-base-uncased-finetuned-sst-2-english",
+                    model=HF_SENTIMENT_MODEL,
                     return_all_scores=True
                 )
                 logger.info("HuggingFace sentiment pipeline initialized")
@@ -39,6 +100,31 @@ class SentimentAnalyzer:
     
     async def analyze(self, text: str) -> Dict[str, Any]:
         """Analyze sentiment of the given text"""
+        normalized = text.strip().lower()
+        
+        # Nothing to score (empty or symbols only) - skip the provider round trip
+        if not _TOKEN_RE.search(normalized):
+            return self._basic_sentiment(text)
+        
+        key = hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        
+        # Concurrent requests for the same text share one provider call
+        pending = self._in_flight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._analyze_uncached(text))
+            self._in_flight[key] = pending
+            pending.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        
+        # Shielded so one cancelled request doesn't cancel the shared call
+        result = await asyncio.shield(pending)
+        self._cache[key] = result
+        return dict(result)
+    
+    async def _analyze_uncached(self, text: str) -> Dict[str, Any]:
+        """Analyze sentiment with the best available provider"""
         try:
             if self.google_client:
                 return await self._analyze_with_google(text)
@@ -86,13 +172,12 @@ class SentimentAnalyzer:
     async def _analyze_with_huggingface(self, text: str) -> Dict[str, Any]:
         """Analyze using HuggingFace transformers"""
         try:
-            def _sync_analyze():
-                results = self.hf_pipeline(text)
-                return results[0]  # Get all scores
+            future = asyncio.get_running_loop().create_future()
+            self._pending.append((text, future))
+            if self._batch_task is None or self._batch_task.done():
+                self._batch_task = asyncio.create_task(self._run_hf_batches())
             
-            # Run in thread pool
-            loop = asyncio.get_event_loop()
-            results = await loop.run_in_executor(None, _sync_analyze)
+            results = await future  # All scores for this text
             
             # Convert to consistent format
             positive_score = next((r["score"] for r in results if r["label"] == "POSITIVE"), 0.5)
@@ -113,21 +198,37 @@ class SentimentAnalyzer:
             logger.error(f"HuggingFace sentiment analysis failed: {e}")
             return self._basic_sentiment(text)
     
+    async def _run_hf_batches(self):
+        """Run pending texts through the HuggingFace pipeline in batches"""
+        loop = asyncio.get_running_loop()
+        
+        while self._pending:
+            if len(self._pending) < HF_MAX_BATCH_SIZE:
+                await asyncio.sleep(HF_BATCH_WINDOW_S)
+            
+            batch = self._pending[:HF_MAX_BATCH_SIZE]
+            self._pending = self._pending[HF_MAX_BATCH_SIZE:]
+            
+            try:
+                # Run in thread pool
+                outputs = await loop.run_in_executor(
+                    None, self.hf_pipeline, [text for text, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+    
     def _basic_sentiment(self, text: str) -> Dict[str, Any]:
         """Basic rule-based sentiment fallback"""
-        positive_words = [
-            "good", "great", "happy", "joy", "love", "wonderful", "amazing", 
-            "excellent", "fantastic", "perfect", "awesome", "brilliant"
-        ]
-        negative_words = [
-            "bad", "terrible", "sad", "angry", "hate", "awful", "horrible", 
-            "depressed", "anxious", "worried", "scared", "lonely", "hopeless",
-            "suicide", "kill", "die", "hurt", "pain"
-        ]
-        
-        text_lower = text.lower()
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
+        tokens = _TOKEN_RE.findall(text.lower())
+        positive_count = sum(1 for token in tokens if token in _POSITIVE_WORDS)
+        negative_count = sum(1 for token in tokens if token in _NEGATIVE_WORDS)
         
         if negative_count > positive_count:
             score = -0.7
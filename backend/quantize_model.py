@@ -0,0 +1,29 @@
+"""
+Export the HuggingFace sentiment model to ONNX and quantize it to int8.
+
+Usage:
+    python quantize_model.py [output_dir]
+
+Then point the backend at the export with SENTIMENT_ONNX_DIR=<output_dir>.
+"""
+import sys
+
+from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+from nlp import HF_SENTIMENT_MODEL
+
+def quantize(output_dir: str):
+    """Write model.onnx, model_quantized.onnx and the tokenizer to output_dir"""
+    model = ORTModelForSequenceClassification.from_pretrained(HF_SENTIMENT_MODEL, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(HF_SENTIMENT_MODEL).save_pretrained(output_dir)
+    
+    # Dynamic quantization: weights stored as int8, activations quantized at runtime
+    quantizer = ORTQuantizer.from_pretrained(model)
+    config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=config)
+
+if __name__ == "__main__":
+    quantize(sys.argv[1] if len(sys.argv) > 1 else "models/sentiment-onnx")
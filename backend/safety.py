@@ -1,85 +1,196 @@
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Pattern, ClassVar, FrozenSet
 import logging
 
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 logger = logging.getLogger(__name__)
 
+# Words as the regex engine's \b sees them, so set lookups match \bword\b
+_WORD_RE = re.compile(r"\w+")
+
+def _build_hyperscan_db(patterns: List[str]):
+    """Hyperscan database of the crisis patterns, if hyperscan is installed"""
+    if hyperscan is None:
+        return None
+    
+    try:
+        count = len(patterns)
+        flags = hyperscan.HS_FLAG_SINGLEMATCH
+        database = hyperscan.Database()
+        database.compile(
+            expressions=[pattern.encode() for pattern in patterns],
+            ids=list(range(count)),
+            elements=count,
+            flags=[flags] * count
+        )
+        return database
+    except Exception as e:
+        logger.warning(f"Hyperscan compilation failed, using re: {e}")
+        return None
+
+def _build_phrase_automaton(phrases: List[str]):
+    """Aho-Corasick automaton over the high-risk phrases, if pyahocorasick is installed"""
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for phrase in phrases:
+        automaton.add_word(phrase, phrase)
+    automaton.make_automaton()
+    return automaton
+
+def _index_combinations(combinations: List[List[str]]) -> Tuple[Dict[str, int], Pattern, List[int]]:
+    """Keyword bits, a regex that finds the keywords, and one mask per combination"""
+    # One bit per keyword; phrases such as "give up" stay a single keyword.
+    # Longest first, so a keyword is never cut short by a shorter one it starts with
+    keywords = sorted(
+        {keyword for combination in combinations for keyword in combination},
+        key=lambda keyword: (-len(keyword), keyword)
+    )
+    keyword_bits = {keyword: 1 << i for i, keyword in enumerate(keywords)}
+    # Keywords start at a word boundary but may run on ("pain" in "painful"), and the scan stays in C
+    keyword_re = re.compile(r"\b(?:" + "|".join(re.escape(keyword) for keyword in keywords) + ")")
+    combo_masks = [
+        sum({keyword_bits[keyword] for keyword in combination})
+        for combination in combinations
+    ]
+    return keyword_bits, keyword_re, combo_masks
+
 class CrisisDetector:
-    def __init__(self):
-        # Crisis keywords and phrases
-        self.crisis_patterns = [
-            # Suicide ideation
-            r'\b(?:kill\s+myself|suicide|end\s+my\s+life|take\s+my\s+life|want\s+to\s+die)\b',
-            r'\b(?:suicidal|end\s+it\s+all|not\s+worth\s+living|better\s+off\s+dead)\b',
-            
-            # Self-harm
-            r'\b(?:cut\s+myself|hurt\s+myself|self\s*harm|cutting|burning\s+myself)\b',
-            r'\b(?:razor|blade|pills\s+to\s+die|overdose)\b',
-            
-            # Immediate danger
-            r'\b(?:going\s+to\s+kill|planning\s+to\s+die|tonight\s+.*\s+die|ready\s+to\s+die)\b',
-            r'\b(?:gun|rope|bridge|jump\s+off|pills\s+.*\s+die)\b',
-            
-            # Harm to others
-            r'\b(?:kill\s+(?:someone|them|him|her)|hurt\s+(?:someone|people|others))\b',
-            r'\b(?:planning\s+to\s+hurt|going\s+to\s+hurt|want\s+to\s+hurt\s+(?:someone|others))\b'
-        ]
+    # Crisis keywords and phrases; these and everything compiled from them are shared by all instances
+    # Single-word indicators are checked as a set against the message's words
+    crisis_words: ClassVar[FrozenSet[str]] = frozenset({
+        "suicide", "suicidal",  # Suicide ideation
+        "cutting", "razor", "blade", "overdose",  # Self-harm
+        "gun", "rope", "bridge"  # Immediate danger
+    })
+    
+    # Multi-word indicators need the regex engine
+    crisis_patterns: ClassVar[List[str]] = [
+        # Suicide ideation
+        r'\b(?:kill\s+myself|end\s+my\s+life|take\s+my\s+life|want\s+to\s+die)\b',
+        r'\b(?:end\s+it\s+all|not\s+worth\s+living|better\s+off\s+dead)\b',
         
-        # Compile patterns for efficiency
-        self.compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.crisis_patterns]
+        # Self-harm
+        r'\b(?:cut\s+myself|hurt\s+myself|self\s*harm|burning\s+myself|pills\s+to\s+die)\b',
         
-        # Additional high-risk phrases
-        self.high_risk_phrases = [
-            "can't go on", "nothing to live for", "everyone would be better off without me",
-            "final goodbye", "last time", "saying goodbye", "won't be here tomorrow"
-        ]
+        # Immediate danger
+        r'\b(?:going\s+to\s+kill|planning\s+to\s+die|tonight\s+.*\s+die|ready\s+to\s+die)\b',
+        r'\b(?:jump\s+off|pills\s+.*\s+die)\b',
+        
+        # Harm to others
+        r'\b(?:kill\s+(?:someone|them|him|her)|hurt\s+(?:someone|people|others))\b',
+        r'\b(?:planning\s+to\s+hurt|going\s+to\s+hurt|want\s+to\s+hurt\s+(?:someone|others))\b'
+    ]
+    
+    # One alternation so the message is scanned once rather than once per pattern.
+    # IGNORECASE on the original text, because str.lower() splits letters such as "İ" in two
+    combined_pattern: ClassVar[Pattern] = re.compile(
+        "|".join(f"(?:{pattern})" for pattern in crisis_patterns), re.IGNORECASE
+    )
+    # The crisis words as a regex, for text the lowercased word set can't be trusted with
+    _crisis_word_re: ClassVar[Pattern] = re.compile(
+        r"\b(?:" + "|".join(sorted(crisis_words)) + r")\b", re.IGNORECASE
+    )
+    hyperscan_db: ClassVar[Any] = _build_hyperscan_db(crisis_patterns)
+    
+    # Additional high-risk phrases
+    high_risk_phrases: ClassVar[List[str]] = [
+        "can't go on", "nothing to live for", "everyone would be better off without me",
+        "final goodbye", "last time", "saying goodbye", "won't be here tomorrow"
+    ]
+    phrase_automaton: ClassVar[Any] = _build_phrase_automaton(high_risk_phrases)
+    # Without pyahocorasick, one regex alternation finds any phrase in a single scan
+    _high_risk_re: ClassVar[Pattern] = re.compile(
+        "|".join(re.escape(phrase) for phrase in high_risk_phrases)
+    )
+    
+    # Combinations that might indicate crisis; each keyword is matched from the start of a word
+    crisis_combinations: ClassVar[List[List[str]]] = [
+        ["pain", "can't", "anymore"],
+        ["tired", "fighting", "give up"],
+        ["no one", "cares", "alone"],
+        ["pointless", "life", "meaningless"]
+    ]
+    _keyword_bits, _combo_keyword_re, _combo_masks = _index_combinations(crisis_combinations)
+    
+    def _has_crisis_word(self, message: str, message_lower: str) -> bool:
+        """Check the message for single-word crisis indicators"""
+        if message.isascii():
+            return not self.crisis_words.isdisjoint(_WORD_RE.findall(message_lower))
+        return self._crisis_word_re.search(message) is not None
+    
+    def _matches_crisis_pattern(self, message: str, message_lower: str) -> bool:
+        """Check the message against the crisis regex patterns"""
+        # Hyperscan's \b and \s are ASCII-only, so other text keeps re's Unicode semantics
+        if self.hyperscan_db is not None and message.isascii():
+            try:
+                # Returning True from the handler stops the scan at the first match
+                self.hyperscan_db.scan(message_lower.encode(), match_event_handler=lambda *_: True)
+            except hyperscan.ScanTerminated:
+                return True
+            return False
+        
+        return self.combined_pattern.search(message) is not None
     
     def detect_crisis(self, message: str) -> bool:
         """Detect if the message contains crisis indicators"""
-        try:
-            # Check compiled regex patterns
-            for pattern in self.compiled_patterns:
-                if pattern.search(message):
-                    logger.warning(f"Crisis pattern detected in message")
-                    return True
-            
-            # Check high-risk phrases
-            message_lower = message.lower()
-            for phrase in self.high_risk_phrases:
-                if phrase in message_lower:
-                    logger.warning(f"High-risk phrase detected: {phrase}")
-                    return True
-            
-            # Additional contextual analysis
-            if self._contextual_crisis_check(message_lower):
-                logger.warning("Contextual crisis indicators detected")
-                return True
-                
+        # Non-text input can't carry crisis indicators; the checks below don't raise for str
+        if not isinstance(message, str):
             return False
+        
+        # ASCII text is lowercased once for every check; other text keeps re's case-insensitive matching
+        message_lower = message.lower()
+        
+        # Check crisis words, then the multi-word regex patterns
+        if self._has_crisis_word(message, message_lower):
+            logger.warning("Crisis word detected in message")
+            return True
+        
+        if self._matches_crisis_pattern(message, message_lower):
+            logger.warning("Crisis pattern detected in message")
+            return True
+        
+        # Check high-risk phrases
+        phrase = self._find_high_risk_phrase(message_lower)
+        if phrase:
+            logger.warning(f"High-risk phrase detected: {phrase}")
+            return True
+        
+        # Additional contextual analysis
+        if self._contextual_crisis_check(message_lower):
+            logger.warning("Contextual crisis indicators detected")
+            return True
             
-        except Exception as e:
-            logger.error(f"Crisis detection failed: {e}")
-            return False  # Fail safe - don't trigger false positives
+        return False
+    
+    def _find_high_risk_phrase(self, message_lower: str) -> Optional[str]:
+        """Return the first high-risk phrase in the message, if any"""
+        if self.phrase_automaton is not None:
+            # One pass over the message for all phrases
+            for _, phrase in self.phrase_automaton.iter(message_lower):
+                return phrase
+            return None
+        
+        match = self._high_risk_re.search(message_lower)
+        return match.group(0) if match else None
     
     def _contextual_crisis_check(self, message: str) -> bool:
         """Additional contextual checks for crisis detection"""
-        # Combinations that might indicate crisis
-        crisis_combinations = [
-            ["pain", "can't", "anymore"],
-            ["tired", "fighting", "give up"],
-            ["no one", "cares", "alone"],
-            ["pointless", "life", "meaningless"]
-        ]
-        
-        for combination in crisis_combinations:
-            if all(word in message for word in combination):
-                return True
+        # OR together the bit of every keyword in the message, then test each combination
+        mask = 0
+        for keyword in self._combo_keyword_re.findall(message):
+            mask |= self._keyword_bits[keyword]
         
-        return False
+        return any(mask & combo_mask == combo_mask for combo_mask in self._combo_masks)
 
-def get_crisis_response() -> str:
-    """Return the standardized crisis response"""
-    return """I'm very concerned about what you've shared with me. Your safety is the most important thing right now.
+_CRISIS_RESPONSE = """I'm very concerned about what you've shared with me. Your safety is the most important thing right now.
 
 Please reach out for immediate help:
 
@@ -96,9 +207,7 @@ You don't have to go through this alone. Professional counselors are trained to
 
 I care about your wellbeing, but I'm not equipped to provide the immediate professional help you need right now. Please reach out to one of these resources."""
 
-def get_safety_disclaimer() -> str:
-    """Return the safety disclaimer for the application"""
-    return """**Important Safety Information:**
+_SAFETY_DISCLAIMER = """**Important Safety Information:**
 
 🤖 **This is an AI chatbot** designed to provide emotional support and wellness resources. It is NOT a replacement for professional mental health care, medical advice, or emergency services.
 
@@ -117,10 +226,28 @@ If you're experiencing thoughts of self-harm, suicide, or immediate danger, plea
 
 📞 **Professional Help:** We strongly encourage speaking with a licensed mental health professional for ongoing support and treatment."""
 
+def get_crisis_response() -> str:
+    """Return the standardized crisis response"""
+    return _CRISIS_RESPONSE
+
+def get_safety_disclaimer() -> str:
+    """Return the safety disclaimer for the application"""
+    return _SAFETY_DISCLAIMER
+
+# Longer messages are flagged; past the blocked length they skip the remaining checks
+MAX_MESSAGE_LENGTH = 2000
+BLOCKED_MESSAGE_LENGTH = 10000
+
+# Shared by every validate_message_safety call
+_DETECTOR = CrisisDetector()
+
+_INAPPROPRIATE = re.compile(
+    r'\b(?:spam|advertisement|buy\s+now|click\s+here|hate|racist|discrimination)\b',
+    re.IGNORECASE
+)
+
 def validate_message_safety(message: str) -> Dict[str, Any]:
     """Comprehensive message safety validation"""
-    detector = CrisisDetector()
-    
     result = {
         "safe": True,
         "crisis_detected": False,
@@ -128,26 +255,25 @@ def validate_message_safety(message: str) -> Dict[str, Any]:
         "concerns": []
     }
     
-    # Crisis detection
-    if detector.detect_crisis(message):
+    # Crisis detection always covers the whole message, however long
+    if _DETECTOR.detect_crisis(message):
         result["safe"] = False
         result["crisis_detected"] = True
         result["risk_level"] = "high"
         result["concerns"].append("Crisis indicators detected")
     
-    # Check message length (prevent spam/abuse)
-    if len(message) > 2000:
+    # Check message length (prevent spam/abuse); far oversized messages are blocked outright
+    if len(message) > BLOCKED_MESSAGE_LENGTH:
+        result["safe"] = False
+        result["risk_level"] = "blocked"
         result["concerns"].append("Message too long")
+        return result
     
-    # Check for inappropriate content (basic)
-    inappropriate_patterns = [
-        r'\b(?:spam|advertisement|buy\s+now|click\s+here)\b',
-        r'\b(?:hate|racist|discrimination)\b'
-    ]
+    if len(message) > MAX_MESSAGE_LENGTH:
+        result["concerns"].append("Message too long")
     
-    for pattern in inappropriate_patterns:
-        if re.search(pattern, message, re.IGNORECASE):
-            result["concerns"].append("Potentially inappropriate content")
-            break
+    # Check for inappropriate content (basic)
+    if _INAPPROPRIATE.search(message):
+        result["concerns"].append("Potentially inappropriate content")
     
     return result
\ No newline at end of file
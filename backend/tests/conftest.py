@@ -0,0 +1,24 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import httpx
+
+# Add backend to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """One event loop for the session, so the shared client outlives a single test"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest_asyncio.fixture(scope="session")
+async def client():
+    """An async client that calls the app in-process, shared by every test"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
@@ -2,227 +2,363 @@ import pytest
 import asyncio
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch, MagicMock
+from types import SimpleNamespace
 import json
+from datetime import datetime
 
 # Import the main app
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import main
 from main import app
+from safety import CrisisDetector, get_crisis_response
 
-client = TestClient(app)
+NEUTRAL_SENTIMENT = {"provider": "mock", "score": 0.0, "label": "neutral", "confidence": 0.5}
+
+@pytest.fixture(scope="module", autouse=True)
+def _patched_services():
+    """Patch the sentiment, crisis and LLM services once for the whole module"""
+    with patch.object(main, "sentiment_analyzer") as mock_sentiment, \
+         patch.object(main, "crisis_detector") as mock_crisis, \
+         patch.object(main, "llm_client") as mock_llm:
+        yield SimpleNamespace(sentiment=mock_sentiment, crisis=mock_crisis, llm=mock_llm)
+
+@pytest.fixture
+def services(_patched_services):
+    """The shared mocks, reset to a neutral, non-crisis exchange for each test"""
+    for mock in vars(_patched_services).values():
+        mock.reset_mock(return_value=True, side_effect=True)
+
+    _patched_services.sentiment.analyze = AsyncMock(return_value=dict(NEUTRAL_SENTIMENT))
+    _patched_services.crisis.detect_crisis.return_value = False
+    _patched_services.llm.generate_response = AsyncMock(return_value="I'm here to listen.")
+    _patched_services.llm.aclose = AsyncMock()
+    return _patched_services
 
 class TestHealthEndpoints:
-    def test_root_endpoint(self):
+    @pytest.mark.asyncio
+    async def test_root_endpoint(self, client):
         """Test the root endpoint"""
-        response = client.get("/")
+        response = await client.get("/")
         assert response.status_code == 200
         data = response.json()
         assert "MindMate" in data["message"]
         assert data["status"] == "healthy"
-    
-    def test_health_check(self):
+
+    @pytest.mark.asyncio
+    async def test_health_check(self, client):
         """Test health check endpoint"""
-        response = client.get("/health")
+        response = await client.get("/health")
         assert response.status_code == 200
         data = response.json()
         assert data["status"] == "healthy"
         assert "timestamp" in data
+        assert datetime.fromisoformat(data["timestamp"])
+
+    def test_startup_warms_sentiment_model(self, services):
+        """Test that the lifespan runs the sentiment model once before serving"""
+        with TestClient(app) as lifespan_client:
+            services.sentiment.hf_pipeline.assert_called_once_with(["warmup"])
+            assert lifespan_client.get("/health").status_code == 200
+
+        services.llm.aclose.assert_awaited_once()
 
 class TestChatEndpoint:
-    @patch('main.sentiment_analyzer')
-    @patch('main.crisis_detector')
-    @patch('main.llm_client')
-    def test_normal_conversation(self, mock_llm, mock_crisis, mock_sentiment):
+    @pytest.mark.asyncio
+    async def test_normal_conversation(self, client, services):
         """Test normal conversation flow"""
         # Mock sentiment analysis
-        mock_sentiment.analyze = AsyncMock(return_value={
+        services.sentiment.analyze.return_value = {
             "provider": "mock",
             "score": 0.3,
             "magnitude": 0.5,
             "label": "positive",
             "confidence": 0.8
-        })
-        
-        # Mock crisis detection
-        mock_crisis.detect_crisis.return_value = False
-        
+        }
+
         # Mock LLM response
-        mock_llm.generate_response = AsyncMock(return_value="I understand you're feeling positive today. That's wonderful! What's been going well for you?")
-        
-        response = client.post("/chat", json={
+        services.llm.generate_response.return_value = "I understand you're feeling positive today. That's wonderful! What's been going well for you?"
+
+        response = await client.post("/chat", json={
             "message": "I'm feeling good today",
             "conversation_id": "test123"
         })
-        
+
         assert response.status_code == 200
         data = response.json()
         assert data["crisis_detected"] == False
         assert "positive" in data["sentiment"]["label"]
         assert len(data["response"]) > 0
         assert data["conversation_id"] == "test123"
-    
-    @patch('main.sentiment_analyzer')
-    @patch('main.crisis_detector')
-    def test_crisis_detection(self, mock_crisis, mock_sentiment):
+
+    @pytest.mark.asyncio
+    async def test_crisis_detection(self, client, services):
         """Test crisis detection and response"""
-        # Mock sentiment analysis
-        mock_sentiment.analyze = AsyncMock(return_value={
-            "provider": "mock",
-            "score": -0.9,
-            "magnitude": 0.9,
-            "label": "negative",
-            "confidence": 0.9
-        })
-        
         # Mock crisis detection - return True
-        mock_crisis.detect_crisis.return_value = True
-        
-        response = client.post("/chat", json={
+        services.crisis.detect_crisis.return_value = True
+
+        response = await client.post("/chat", json={
             "message": "I want to end my life",
             "conversation_id": "crisis_test"
         })
-        
+
         assert response.status_code == 200
         data = response.json()
         assert data["crisis_detected"] == True
         assert "988" in data["response"]  # Should include crisis hotline
         assert data["resources"] is not None
         assert len(data["resources"]) > 0
-    
-    def test_missing_message(self):
+
+        # Crisis responses skip the sentiment model
+        services.sentiment.analyze.assert_not_called()
+        assert data["sentiment"]["provider"] == "bypass"
+        assert data["sentiment"]["label"] == "negative"
+
+    @pytest.mark.asyncio
+    async def test_missing_message(self, client):
         """Test request with missing message"""
-        response = client.post("/chat", json={
+        response = await client.post("/chat", json={
             "conversation_id": "test123"
         })
         assert response.status_code == 422  # Validation error
-    
-    def test_empty_message(self):
+
+    @pytest.mark.asyncio
+    async def test_empty_message(self, client, services):
         """Test request with empty message"""
-        response = client.post("/chat", json={
+        response = await client.post("/chat", json={
             "message": "",
             "conversation_id": "test123"
         })
         # Should still process but might handle gracefully
         assert response.status_code in [200, 422]
-    
-    @patch('main.sentiment_analyzer')
-    @patch('main.crisis_detector')
-    @patch('main.llm_client')
-    def test_long_conversation_history(self, mock_llm, mock_crisis, mock_sentiment):
+
+    @pytest.mark.asyncio
+    async def test_message_length_limits(self, client):
+        """Test that blank and oversized messages are rejected"""
+        for message in ["   ", "x" * 4001]:
+            response = await client.post("/chat", json={
+                "message": message,
+                "conversation_id": "test123"
+            })
+            assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_long_conversation_history(self, client, services):
         """Test conversation with long history"""
-        # Mock responses
-        mock_sentiment.analyze = AsyncMock(return_value={
-            "provider": "mock", "score": 0.0, "label": "neutral", "confidence": 0.5
-        })
-        mock_crisis.detect_crisis.return_value = False
-        mock_llm.generate_response = AsyncMock(return_value="I'm here to listen.")
-        
         # Send multiple messages to build history
         conversation_id = "long_test"
         for i in range(10):
-            response = client.post("/chat", json={
+            response = await client.post("/chat", json={
                 "message": f"This is message {i}",
                 "conversation_id": conversation_id
             })
             assert response.status_code == 200
-        
+
         # Verify last response
         data = response.json()
         assert data["conversation_id"] == conversation_id
 
+        # History is capped at the last 3 exchanges
+        response = await client.get(f"/conversations/{conversation_id}")
+        history = response.json()["history"]
+        assert len(history) == 6
+        assert history[-2]["content"] == "This is message 9"
+
+class TestChatBatchEndpoint:
+    @pytest.mark.asyncio
+    async def test_batch_answers_in_order(self, client, services):
+        """Test that a batch answers each message in turn within one conversation"""
+        services.llm.generate_response.side_effect = ["First reply", "Second reply"]
+
+        response = await client.post("/chat/batch", json={
+            "messages": ["Hello", "How are you?"],
+            "conversation_id": "batch_test"
+        })
+
+        assert response.status_code == 200
+        responses = response.json()["responses"]
+        assert [r["response"] for r in responses] == ["First reply", "Second reply"]
+        assert all(r["conversation_id"] == "batch_test" for r in responses)
+
+        # The second turn saw the first exchange
+        second_history = services.llm.generate_response.call_args.kwargs["conversation_history"]
+        assert [m["content"] for m in second_history] == ["Hello", "First reply", "How are you?"]
+
+        history = (await client.get("/conversations/batch_test")).json()["history"]
+        assert [m["content"] for m in history] == ["Hello", "First reply", "How are you?", "Second reply"]
+
+    @pytest.mark.asyncio
+    async def test_batch_limits(self, client):
+        """Test that empty and oversized batches are rejected"""
+        for messages in [[], ["hi"] * 21, ["hi", "   "]]:
+            response = await client.post("/chat/batch", json={"messages": messages})
+            assert response.status_code == 422
+
+def _sse_events(response):
+    """Decode the data frames of a server-sent event stream"""
+    return [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+class TestChatStreamEndpoint:
+    @pytest.mark.asyncio
+    async def test_stream_tokens_then_done(self, client, services):
+        """Test that tokens arrive as they are generated, followed by the metadata"""
+        services.sentiment.analyze.return_value = {
+            "provider": "mock", "score": 0.3, "label": "positive", "confidence": 0.8
+        }
+
+        async def fake_stream(**kwargs):
+            for chunk in ["That's ", "great ", "to hear."]:
+                yield chunk
+        services.llm.generate_response_stream = fake_stream
+
+        response = await client.post("/chat/stream", json={
+            "message": "I had a good day",
+            "conversation_id": "stream_test"
+        })
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(response)
+        assert [e["content"] for e in events if e["type"] == "token"] == ["That's ", "great ", "to hear."]
+        assert events[-1]["type"] == "done"
+        assert events[-1]["response"] == "That's great to hear."
+        assert events[-1]["sentiment"]["label"] == "positive"
+        assert events[-1]["crisis_detected"] == False
+
+        # The finished reply is recorded like a /chat reply
+        history = (await client.get("/conversations/stream_test")).json()["history"]
+        assert [m["content"] for m in history] == ["I had a good day", "That's great to hear."]
+
+    @pytest.mark.asyncio
+    async def test_stream_error_after_partial_reply(self, client, services):
+        """Test that a reply cut off mid-stream ends with an error and stays out of history"""
+        async def broken_stream(**kwargs):
+            yield "I hear "
+            raise RuntimeError("connection reset")
+        services.llm.generate_response_stream = broken_stream
+
+        response = await client.post("/chat/stream", json={
+            "message": "Rough day",
+            "conversation_id": "stream_error_test"
+        })
+
+        events = _sse_events(response)
+        assert [e["type"] for e in events] == ["token", "error"]
+
+        history = (await client.get("/conversations/stream_error_test")).json()["history"]
+        assert [m["content"] for m in history] == ["Rough day"]
+
+    @pytest.mark.asyncio
+    async def test_stream_crisis(self, client, services):
+        """Test that crisis messages stream the crisis response without the LLM"""
+        services.crisis.detect_crisis.return_value = True
+
+        response = await client.post("/chat/stream", json={"message": "I want to end my life"})
+
+        events = _sse_events(response)
+        assert "988" in events[0]["content"]
+        assert events[-1]["type"] == "done"
+        assert events[-1]["crisis_detected"] == True
+        assert len(events[-1]["resources"]) > 0
+        services.sentiment.analyze.assert_not_called()
+
 class TestConversationManagement:
-    def test_get_nonexistent_conversation(self):
+    @pytest.mark.asyncio
+    async def test_get_nonexistent_conversation(self, client):
         """Test getting a conversation that doesn't exist"""
-        response = client.get("/conversations/nonexistent")
+        response = await client.get("/conversations/nonexistent")
         assert response.status_code == 404
-    
-    def test_conversation_lifecycle(self):
+
+    @pytest.mark.asyncio
+    async def test_conversation_lifecycle(self, client, services):
         """Test full conversation lifecycle"""
         conversation_id = "lifecycle_test"
-        
+        services.llm.generate_response.return_value = "Test response"
+
         # Send a message to create conversation
-        with patch('main.sentiment_analyzer'), \
-             patch('main.crisis_detector'), \
-             patch('main.llm_client'):
-            
-            # Mock the dependencies
-            import main
-            main.sentiment_analyzer.analyze = AsyncMock(return_value={
-                "provider": "mock", "score": 0.0, "label": "neutral", "confidence": 0.5
-            })
-            main.crisis_detector.detect_crisis.return_value = False
-            main.llm_client.generate_response = AsyncMock(return_value="Test response")
-            
-            response = client.post("/chat", json={
-                "message": "Hello",
-                "conversation_id": conversation_id
-            })
-            assert response.status_code == 200
-        
+        response = await client.post("/chat", json={
+            "message": "Hello",
+            "conversation_id": conversation_id
+        })
+        assert response.status_code == 200
+
         # Get conversation
-        response = client.get(f"/conversations/{conversation_id}")
+        response = await client.get(f"/conversations/{conversation_id}")
         assert response.status_code == 200
         data = response.json()
         assert data["conversation_id"] == conversation_id
         assert len(data["history"]) >= 2  # User message + bot response
-        
+        assert data["history"][0]["role"] == "user"
+        assert data["history"][0]["content"] == "Hello"
+        assert data["history"][1]["role"] == "assistant"
+        assert data["history"][1]["content"] == "Test response"
+        assert datetime.fromisoformat(data["history"][0]["timestamp"])
+
         # Clear conversation
-        response = client.delete(f"/conversations/{conversation_id}")
+        response = await client.delete(f"/conversations/{conversation_id}")
         assert response.status_code == 200
-        
+
         # Verify it's gone
-        response = client.get(f"/conversations/{conversation_id}")
+        response = await client.get(f"/conversations/{conversation_id}")
         assert response.status_code == 404
 
+class TestSessionBootstrap:
+    @pytest.mark.asyncio
+    async def test_bootstrap_without_conversation(self, client):
+        """Test that the bootstrap reports health even before the first message"""
+        response = await client.get("/session/bootstrap", params={"conversation_id": "bootstrap_new"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["health"]["status"] == "healthy"
+        assert data["stats"] is None
+
+    @pytest.mark.asyncio
+    async def test_bootstrap_counts_messages(self, client, services):
+        """Test that the bootstrap includes the conversation's message count"""
+        await client.post("/chat", json={"message": "Hello", "conversation_id": "bootstrap_test"})
+
+        response = await client.get("/session/bootstrap", params={"conversation_id": "bootstrap_test"})
+        assert response.json()["stats"] == {"message_count": 2}
+
 class TestErrorHandling:
-    @patch('main.sentiment_analyzer')
-    def test_sentiment_analysis_failure(self, mock_sentiment):
+    @pytest.mark.asyncio
+    async def test_sentiment_analysis_failure(self, client, services):
         """Test handling of sentiment analysis failures"""
         # Make sentiment analysis raise an exception
-        mock_sentiment.analyze = AsyncMock(side_effect=Exception("Sentiment API failed"))
-        
-        with patch('main.crisis_detector'), patch('main.llm_client'):
-            response = client.post("/chat", json={
-                "message": "Test message",
-                "conversation_id": "error_test"
-            })
-            # Should still return 500 or handle gracefully
-            assert response.status_code in [200, 500]
-    
-    @patch('main.llm_client')
-    def test_llm_failure(self, mock_llm):
+        services.sentiment.analyze.side_effect = Exception("Sentiment API failed")
+
+        response = await client.post("/chat", json={
+            "message": "Test message",
+            "conversation_id": "error_test"
+        })
+        # Should still return 500 or handle gracefully
+        assert response.status_code in [200, 500]
+
+    @pytest.mark.asyncio
+    async def test_llm_failure(self, client, services):
         """Test handling of LLM failures"""
         # Make LLM generation raise an exception
-        mock_llm.generate_response = AsyncMock(side_effect=Exception("LLM API failed"))
-        
-        with patch('main.sentiment_analyzer'), patch('main.crisis_detector'):
-            import main
-            main.sentiment_analyzer.analyze = AsyncMock(return_value={
-                "provider": "mock", "score": 0.0, "label": "neutral", "confidence": 0.5
-            })
-            main.crisis_detector.detect_crisis.return_value = False
-            
-            response = client.post("/chat", json={
-                "message": "Test message",
-                "conversation_id": "llm_error_test"
-            })
-            assert response.status_code in [200, 500]
+        services.llm.generate_response.side_effect = Exception("LLM API failed")
+
+        response = await client.post("/chat", json={
+            "message": "Test message",
+            "conversation_id": "llm_error_test"
+        })
+        assert response.status_code in [200, 500]
 
 # Test utilities for safety module
 class TestSafetyModule:
     def test_crisis_detection_import(self):
         """Test that safety module imports correctly"""
-        from safety import CrisisDetector, get_crisis_response
-        
         detector = CrisisDetector()
         assert detector is not None
-        
+
         crisis_response = get_crisis_response()
         assert "988" in crisis_response
         assert "911" in crisis_response
 
 # Run tests
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])
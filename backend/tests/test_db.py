@@ -0,0 +1,224 @@
+import pytest
+import asyncio
+import sqlite3
+import aiosqlite
+from unittest.mock import patch
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ConversationLogger, SentimentLabel, INSERT_ROWS_PER_STATEMENT
+
+SENTIMENT = {"score": -0.4, "label": "negative", "confidence": 0.8}
+
+class TestConversationLogger:
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        return str(tmp_path / "conversations.db")
+
+    @pytest.mark.asyncio
+    async def test_initialize_enables_wal(self, db_path):
+        """Test that the logger opens the database in WAL mode"""
+        logger_db = ConversationLogger(db_path)
+        await logger_db.initialize()
+
+        assert logger_db.initialized
+        cursor = await logger_db._conn.execute("PRAGMA journal_mode")
+        assert (await cursor.fetchone())[0] == "wal"
+
+        await logger_db.aclose()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_calls_initialize_once(self, db_path):
+        """Test that concurrent lazy initializations share one connection and flush loop"""
+        logger_db = ConversationLogger(db_path)
+
+        with patch("db.aiosqlite.connect", wraps=aiosqlite.connect) as connect:
+            await asyncio.gather(*(logger_db.log_conversation(f"conv_{i}", SENTIMENT) for i in range(5)))
+
+        assert connect.call_count == 1
+        await logger_db.aclose()
+
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0] == 5
+
+    @pytest.mark.asyncio
+    async def test_aclose_flushes_queued_rows(self, db_path):
+        """Test that rows queued before shutdown are written"""
+        logger_db = ConversationLogger(db_path)
+        await logger_db.initialize()
+
+        for i in range(10):
+            await logger_db.log_conversation(
+                conversation_id=f"conv_{i}",
+                sentiment=SENTIMENT,
+                crisis_detected=i == 0,
+                severity="high" if i == 0 else "low"
+            )
+
+        await logger_db.aclose()
+
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute(
+                "SELECT conversation_id, sentiment_label, crisis_detected FROM conversations ORDER BY id"
+            ).fetchall()
+
+        assert len(rows) == 10
+        assert rows[0] == ("conv_0", SentimentLabel.NEGATIVE, 1)
+        assert rows[-1] == ("conv_9", SentimentLabel.NEGATIVE, 0)
+
+    @pytest.mark.asyncio
+    async def test_flush_splits_large_batches(self, db_path):
+        """Test that a batch larger than one multi-row INSERT is written in full"""
+        logger_db = ConversationLogger(db_path)
+        await logger_db.initialize()
+
+        for i in range(INSERT_ROWS_PER_STATEMENT * 2 + 5):
+            await logger_db.log_conversation(conversation_id=f"conv_{i}", sentiment=SENTIMENT)
+
+        await logger_db.aclose()
+
+        with sqlite3.connect(db_path) as conn:
+            ids = [row[0] for row in conn.execute("SELECT conversation_id FROM conversations ORDER BY id")]
+
+        assert ids == [f"conv_{i}" for i in range(INSERT_ROWS_PER_STATEMENT * 2 + 5)]
+
+    @pytest.mark.asyncio
+    async def test_log_conversation_initializes_lazily(self, db_path):
+        """Test that logging before initialize() still records the row"""
+        logger_db = ConversationLogger(db_path)
+        await logger_db.log_conversation(conversation_id="lazy", sentiment=SENTIMENT)
+        await logger_db.aclose()
+
+        with sqlite3.connect(db_path) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+        assert count == 1
+
+    @pytest.mark.asyncio
+    async def test_get_stats(self, db_path):
+        """Test aggregate statistics over flushed rows"""
+        logger_db = ConversationLogger(db_path)
+        await logger_db.initialize()
+
+        await logger_db.log_conversation("a", SENTIMENT, crisis_detected=True, response_time_ms=100)
+        await logger_db.log_conversation("b", {"score": 0.5, "label": "positive"}, response_time_ms=300)
+        # Reopen so the stats see the flushed batch
+        await logger_db.aclose()
+
+        await logger_db.initialize()
+        stats = await logger_db.get_stats()
+        await logger_db.aclose()
+
+        assert stats["total_conversations"] == 2
+        assert stats["crisis_events"] == 1
+        assert stats["sentiment_distribution"] == {"negative": 1, "positive": 1}
+        assert stats["avg_response_time_ms"] == 200
+        assert stats["recent_activity_24h"] == 2
+
+    @pytest.mark.asyncio
+    async def test_get_stats_empty(self, db_path):
+        """Test statistics on an empty database"""
+        logger_db = ConversationLogger(db_path)
+        await logger_db.initialize()
+        stats = await logger_db.get_stats()
+        await logger_db.aclose()
+
+        assert stats["total_conversations"] == 0
+        assert stats["crisis_events"] == 0
+        assert stats["crisis_rate"] == 0
+        assert stats["recent_activity_24h"] == 0
+        assert stats["sentiment_distribution"] == {}
+
+    @pytest.mark.asyncio
+    async def test_cleanup_drops_expired_partitions(self, db_path):
+        """Test that retention drops whole monthly partitions"""
+        logger_db = ConversationLogger(db_path)
+        await logger_db.initialize()
+        current = logger_db._current_table()
+
+        await logger_db._create_partition("conversations_201901")
+        await logger_db._conn.execute(
+            "INSERT INTO conversations_201901 (conversation_id, timestamp) VALUES ('old', '2019-01-15T00:00:00')"
+        )
+        await logger_db._rebuild_view()
+        await logger_db.log_conversation("new", SENTIMENT)
+
+        await logger_db.cleanup_old_data(days_to_keep=30)
+        await logger_db.aclose()
+
+        with sqlite3.connect(db_path) as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            ids = [row[0] for row in conn.execute("SELECT conversation_id FROM conversations")]
+
+        assert "conversations_201901" not in tables
+        assert current in tables
+        assert ids == ["new"]
+
+    @pytest.mark.asyncio
+    async def test_cleanup_waits_for_flush(self, db_path):
+        """Test that cleanup cannot commit part of a batch that is being written"""
+        logger_db = ConversationLogger(db_path)
+        await logger_db.initialize()
+        await logger_db._create_partition("conversations_201901")
+        await logger_db._rebuild_view()
+
+        # The last statement fails its CHECK constraint, so the whole batch must roll back
+        good_row = ("conv", "2024-01-01T00:00:00", 0.0, 1, 0.5, False, "low", None)
+        bad_row = ("conv", "2024-01-01T00:00:00", 0.0, 7, 0.5, False, "low", None)
+        rows = [good_row] * INSERT_ROWS_PER_STATEMENT + [bad_row]
+
+        flush = asyncio.create_task(logger_db._write_rows(rows))
+        await asyncio.sleep(0)
+        await asyncio.gather(flush, logger_db.cleanup_old_data(days_to_keep=30))
+        await logger_db.aclose()
+
+        with sqlite3.connect(db_path) as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            count = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+        assert "conversations_201901" not in tables
+        assert count == 0
+
+    @pytest.mark.asyncio
+    async def test_legacy_table_becomes_partition(self, db_path):
+        """Test that an unpartitioned database keeps its rows"""
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE conversations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    sentiment_score REAL,
+                    sentiment_label TEXT,
+                    sentiment_confidence REAL,
+                    crisis_detected BOOLEAN DEFAULT FALSE,
+                    severity TEXT DEFAULT 'low',
+                    response_time_ms INTEGER,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute(
+                "INSERT INTO conversations (conversation_id, timestamp, sentiment_label) "
+                "VALUES ('legacy', '2024-01-01T00:00:00', 'positive')"
+            )
+
+        logger_db = ConversationLogger(db_path)
+        await logger_db.initialize()
+        stats = await logger_db.get_stats()
+        await logger_db.aclose()
+
+        assert stats["total_conversations"] == 1
+        assert stats["sentiment_distribution"] == {"positive": 1}
+
+        with sqlite3.connect(db_path) as conn:
+            label = conn.execute("SELECT sentiment_label FROM conversations").fetchone()[0]
+            with pytest.raises(sqlite3.IntegrityError):
+                conn.execute(
+                    f"INSERT INTO {logger_db._current_table()} (conversation_id, timestamp, sentiment_label) "
+                    "VALUES ('bad', '2024-01-01T00:00:00', 'positive')"
+                )
+
+        assert label == SentimentLabel.POSITIVE
@@ -62,6 +62,56 @@ class TestLLMClient:
         # Should return fallback response
         assert isinstance(response, str)
         assert len(response) > 0
+        
+        # No SDK clients means no shared connection pool to close
+        assert llm_client._http is None
+        await llm_client.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_anthropic_sends_system_prompt(self, llm_client):
+        """Test that the system prompt goes in Anthropic's system parameter"""
+        from llm_client import SYSTEM_PROMPT
+        
+        llm_client.anthropic_client = MagicMock()
+        llm_client.anthropic_client.messages.create = AsyncMock(
+            return_value=MagicMock(content=[MagicMock(text=" Hi there ")])
+        )
+        
+        response = await llm_client._generate_with_anthropic("context")
+        
+        kwargs = llm_client.anthropic_client.messages.create.call_args.kwargs
+        assert response == "Hi there"
+        assert kwargs["system"] == SYSTEM_PROMPT
+        assert kwargs["messages"] == [{"role": "user", "content": "context"}]
+    
+    @pytest.mark.asyncio
+    @patch.dict(os.environ, {}, clear=True)
+    async def test_stream_without_api_keys(self):
+        """Test that streaming falls back to one whole fallback response"""
+        llm_client = LLMClient()
+        sentiment = {"label": "negative", "score": -0.6, "confidence": 0.7}
+        
+        chunks = [chunk async for chunk in llm_client.generate_response_stream("Hello", [], sentiment)]
+        
+        assert chunks == [llm_client._fallback_response(sentiment)]
+    
+    @pytest.mark.asyncio
+    async def test_stream_error_after_partial_output(self, llm_client):
+        """Test that a provider error mid-stream is raised rather than ending the reply early"""
+        async def broken_stream(context):
+            yield "I hear "
+            raise RuntimeError("connection reset")
+        
+        llm_client.openai_client = MagicMock()
+        llm_client._stream_with_openai = broken_stream
+        sentiment = {"label": "neutral", "score": 0.0, "confidence": 0.5}
+        
+        chunks = []
+        with pytest.raises(RuntimeError):
+            async for chunk in llm_client.generate_response_stream("Hello", [], sentiment):
+                chunks.append(chunk)
+        
+        assert chunks == ["I hear "]
     
     def test_fallback_responses_variety(self, llm_client):
         """Test that fallback responses vary by sentiment"""
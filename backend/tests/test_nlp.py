@@ -84,4 +84,62 @@ class TestSentimentAnalyzer:
         
         # Should detect negative sentiment
         assert result["score"] < 0
-        assert result["label"] == "negative"
\ No newline at end of file
+        assert result["label"] == "negative"
+
+    def test_fallback_sentiment_matches_whole_words(self, analyzer):
+        """Test that sentiment words inside other words are ignored"""
+        result = analyzer._basic_sentiment("I started a new diet and play badminton")
+        assert result["label"] == "neutral"
+        assert result["score"] == 0.0
+
+    def test_fallback_sentiment_counts_repeated_words(self, analyzer):
+        """Test that each occurrence of a sentiment word counts"""
+        result = analyzer._basic_sentiment("Good day, sad night, good news")
+        assert result["label"] == "positive"
+
+    @pytest.mark.asyncio
+    async def test_huggingface_requests_are_batched(self, analyzer):
+        """Test that concurrent HuggingFace calls share one pipeline call"""
+        calls = []
+
+        def fake_pipeline(texts):
+            calls.append(list(texts))
+            return [
+                [{"label": "POSITIVE", "score": 0.9}, {"label": "NEGATIVE", "score": 0.1}]
+                if "good" in text else
+                [{"label": "POSITIVE", "score": 0.1}, {"label": "NEGATIVE", "score": 0.9}]
+                for text in texts
+            ]
+
+        analyzer.google_client = None
+        analyzer.hf_pipeline = fake_pipeline
+
+        results = await asyncio.gather(
+            analyzer.analyze("I feel good"),
+            analyzer.analyze("I feel awful"),
+            analyzer.analyze("Today was good")
+        )
+
+        assert len(calls) == 1
+        assert sorted(calls[0]) == ["I feel awful", "I feel good", "Today was good"]
+        assert [r["label"] for r in results] == ["positive", "negative", "positive"]
+        assert all(r["provider"] == "huggingface" for r in results)
+
+    @pytest.mark.asyncio
+    async def test_repeated_messages_hit_cache(self, analyzer):
+        """Test that identical messages share one provider call"""
+        calls = []
+
+        def fake_pipeline(texts):
+            calls.append(list(texts))
+            return [[{"label": "POSITIVE", "score": 0.8}, {"label": "NEGATIVE", "score": 0.2}] for _ in texts]
+
+        analyzer.google_client = None
+        analyzer.hf_pipeline = fake_pipeline
+
+        first, second = await asyncio.gather(analyzer.analyze("Thanks"), analyzer.analyze("thanks "))
+        third = await analyzer.analyze("THANKS")
+
+        assert calls == [["Thanks"]]
+        assert first == second == third
+        assert first["label"] == "positive"
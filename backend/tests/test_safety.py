@@ -37,6 +37,50 @@ class TestCrisisDetector:
         for message in self_harm_messages:
             assert detector.detect_crisis(message) == True, f"Failed to detect self-harm in: {message}"
     
+    def test_high_risk_phrases(self, detector):
+        """Test detection of high-risk phrases, with and without the phrase automaton"""
+        phrase_messages = [
+            "I just can't go on like this",
+            "There's nothing to live for",
+            "This is my final goodbye"
+        ]
+        
+        for automaton in [detector.phrase_automaton, None]:
+            detector.phrase_automaton = automaton
+            for message in phrase_messages:
+                assert detector.detect_crisis(message) == True, f"Failed to detect phrase in: {message}"
+            assert detector.detect_crisis("Saying hello to an old friend") == False
+    
+    def test_hyperscan_matches_re(self, detector):
+        """Test that the hyperscan and re pattern paths agree"""
+        if detector.hyperscan_db is None:
+            pytest.skip("hyperscan not installed")
+        
+        messages = [
+            "i want to kill myself",
+            "i'm ready to die",
+            "I'm planning to hurt someone",
+            "I killed it at work today",
+            "jump off\u00e9",  # Non-ASCII word character after a keyword
+            "",
+        ]
+        
+        # _matches_crisis_pattern takes the message and its lowercased copy
+        expected = [detector.combined_pattern.search(m) is not None for m in messages]
+        assert [detector._matches_crisis_pattern(m, m.lower()) for m in messages] == expected
+        assert expected[:3] == [True, True, True]
+    
+    def test_detection_ignores_case(self, detector):
+        """Test that patterns match regardless of the message's case"""
+        assert detector.detect_crisis("I Want To KILL MYSELF") == True
+        assert detector.detect_crisis("SUICIDAL thoughts again") == True
+    
+    def test_crisis_words_are_whole_words(self, detector):
+        """Test that single-word indicators match whole words only"""
+        assert detector.detect_crisis("He bought a gun") == True
+        assert detector.detect_crisis("Overdose.") == True
+        assert detector.detect_crisis("The gunner climbed the ropes") == False
+    
     def test_normal_messages(self, detector):
         """Test that normal messages don't trigger crisis detection"""
         normal_messages = [
@@ -50,6 +94,11 @@ class TestCrisisDetector:
         for message in normal_messages:
             assert detector.detect_crisis(message) == False, f"False positive for: {message}"
     
+    def test_non_ascii_case_variants(self, detector):
+        """Test that case-insensitive matching holds for letters that don't lowercase to ASCII"""
+        assert detector.detect_crisis("SUİCİDE") == True
+        assert detector.detect_crisis("I want to KİLL MYSELF") == True
+    
     def test_contextual_crisis_detection(self, detector):
         """Test contextual crisis indicators"""
         contextual_messages = [
@@ -65,6 +114,18 @@ class TestCrisisDetector:
             # May or may not trigger depending on exact implementation
             # At minimum, should be flagged as concerning
     
+    def test_contextual_combinations_match_keyword_prefixes(self, detector):
+        """Test that combinations need every keyword, each matched from the start of a word"""
+        assert detector._contextual_crisis_check("no one cares and i'm alone") == True
+        assert detector._contextual_crisis_check("no one cares") == False
+        assert detector.detect_crisis("This is painful and I can't take it anymore") == True
+        assert detector.detect_crisis("I'm tiredness fighting give up") == True
+    
+    def test_contextual_phrases_stay_whole(self, detector):
+        """Test that "give up" and "no one" only count as the phrase, not as separate words"""
+        assert detector.detect_crisis("I give it all up, tired of fighting") == False
+        assert detector.detect_crisis("No, one friend cares but I feel alone") == False
+    
     def test_edge_cases(self, detector):
         """Test edge cases for crisis detection"""
         edge_cases = [
@@ -77,6 +138,7 @@ class TestCrisisDetector:
         
         # Empty should not crash
         assert detector.detect_crisis(edge_cases[0]) == False
+        assert detector.detect_crisis(None) == False
         
         # Other cases should not trigger false positives
         for message in edge_cases[1:]:
@@ -111,4 +173,31 @@ def test_message_safety_validation():
     # Test long message
     long_message = "x" * 2500
     long_result = validate_message_safety(long_message)
-    assert "Message too long" in long_result["concerns"]
\ No newline at end of file
+    assert "Message too long" in long_result["concerns"]
+
+def test_inappropriate_content_validation():
+    """Test that inappropriate content is flagged"""
+    result = validate_message_safety("Click here to buy now")
+    assert "Potentially inappropriate content" in result["concerns"]
+    
+    result = validate_message_safety("I'm feeling anxious")
+    assert result["concerns"] == []
+
+def test_oversized_message_blocked():
+    """Test that messages past the hard cap are blocked but still checked for crisis language"""
+    result = validate_message_safety("I want to end my life " + "x" * 10000)
+    assert result["safe"] == False
+    assert result["risk_level"] == "blocked"
+    assert result["crisis_detected"] == True
+    assert "Message too long" in result["concerns"]
+
+    result = validate_message_safety("x" * 10001)
+    assert result["crisis_detected"] == False
+    assert result["concerns"] == ["Message too long"]
+
+def test_crisis_detected_past_length_limit():
+    """Test that crisis language after the first MAX_MESSAGE_LENGTH characters is still found"""
+    result = validate_message_safety("x " * 1500 + "I want to end my life")
+    assert result["crisis_detected"] == True
+    assert result["risk_level"] == "high"
+    assert "Message too long" in result["concerns"]
@@ -1,9 +1,13 @@
 import streamlit as st
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from datetime import datetime
 import time
 
+from utils.api_client import get_api_client
+from utils.helpers import resource_bullets
+
 # Page config
 st.set_page_config(
     page_title="MindMate - Mental Health Support",
@@ -14,9 +18,30 @@ st.set_page_config(
 
 # Constants
 BACKEND_URL = "http://localhost:8000"
+REQUEST_TIMEOUT = (3.05, 30)  # (connect, read) seconds
+MAX_HISTORY_ITEMS = 40  # messages kept in the session (and re-rendered each run)
+
+@st.cache_resource
+def get_http() -> requests.Session:
+    """One keep-alive session per server process, shared across reruns"""
+    session = requests.Session()
+    # Connection failures are retried for every method (nothing was sent); gateway errors only
+    # for idempotent methods, so a chat turn is never submitted twice
+    retries = Retry(
+        total=3,
+        connect=3,
+        backoff_factor=0.25,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "DELETE"}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, pool_block=False, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-# Custom CSS
-st.markdown("""
+# Custom CSS; Streamlit drops elements a rerun doesn't emit, so this is sent on every run
+CUSTOM_CSS = """
 <style>
     .main-header {
         text-align: center;
@@ -24,36 +49,6 @@ st.markdown("""
         font-size: 2.5rem;
         margin-bottom: 1rem;
     }
-    .chat-message {
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 0.5rem 0;
-    }
-    .user-message {
-        background-color: #E3F2FD;
-        margin-left: 2rem;
-    }
-    .assistant-message {
-        background-color: #F1F8E9;
-        margin-right: 2rem;
-    }
-    .crisis-alert {
-        background-color: #FFEBEE;
-        border: 2px solid #F44336;
-        border-radius: 10px;
-        padding: 1rem;
-        margin: 1rem 0;
-    }
-    .sentiment-badge {
-        display: inline-block;
-        padding: 0.25rem 0.5rem;
-        border-radius: 15px;
-        font-size: 0.8rem;
-        margin: 0.25rem;
-    }
-    .sentiment-positive { background-color: #C8E6C9; color: #2E7D32; }
-    .sentiment-negative { background-color: #FFCDD2; color: #C62828; }
-    .sentiment-neutral { background-color: #E0E0E0; color: #424242; }
     .safety-info {
         background-color: #FFF3E0;
         border-left: 4px solid #FF9800;
@@ -61,7 +56,8 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 def initialize_session_state():
     """Initialize session state variables"""
@@ -72,6 +68,13 @@ def initialize_session_state():
     if 'show_resources' not in st.session_state:
         st.session_state.show_resources = False
 
+def add_to_history(item):
+    """Append a message to the session history, keeping only the most recent ones"""
+    history = st.session_state.conversation_history
+    history.append(item)
+    if len(history) > MAX_HISTORY_ITEMS:
+        del history[:-MAX_HISTORY_ITEMS]
+
 def display_safety_disclaimer():
     """Display safety information"""
     st.markdown("""
@@ -85,72 +88,124 @@ def display_safety_disclaimer():
     </div>
     """, unsafe_allow_html=True)
 
+ASSISTANT_AVATAR = "🧠"
+
 def display_message(message, is_user=True, sentiment=None, crisis_detected=False):
-    """Display a chat message with styling"""
-    css_class = "user-message" if is_user else "assistant-message"
-    role = "You" if is_user else "MindMate"
-    
-    message_html = f"""
-    <div class="chat-message {css_class}">
-        <strong>{role}:</strong><br>
-        {message}
-    """
-    
-    if not is_user and sentiment:
-        sentiment_class = f"sentiment-{sentiment.get('label', 'neutral')}"
-        confidence = sentiment.get('confidence', 0) * 100
-        message_html += f"""
-        <br><span class="sentiment-badge {sentiment_class}">
-            Sentiment: {sentiment.get('label', 'neutral').title()} ({confidence:.0f}% confidence)
-        </span>
-        """
-    
-    if crisis_detected:
-        message_html += """
-        <br><div class="crisis-alert">
-            <strong>⚠️ Crisis Response Activated</strong><br>
-            This message has been flagged for immediate attention. Please see the response above for important resources.
-        </div>
-        """
-    
-    message_html += "</div>"
-    st.markdown(message_html, unsafe_allow_html=True)
+    """Display a chat message in a native chat bubble"""
+    with st.chat_message("user" if is_user else "assistant", avatar=None if is_user else ASSISTANT_AVATAR):
+        st.markdown(message)
+        
+        if not is_user and sentiment:
+            confidence = sentiment.get('confidence', 0) * 100
+            st.caption(f"Sentiment: {sentiment.get('label', 'neutral').title()} ({confidence:.0f}% confidence)")
+        
+        if crisis_detected:
+            st.error("⚠️ **Crisis Response Activated** - This message has been flagged for immediate attention. "
+                     "Please see the response above for important resources.")
 
 def send_message(message):
-    """Send message to backend and get response"""
+    """Stream the backend's reply into the page; returns the final response fields"""
+    with st.chat_message("assistant", avatar=ASSISTANT_AVATAR):
+        status = st.status("Thinking...")
+        placeholder = st.empty()
+    reply = ""
+    result = None
+    
     try:
-        with st.spinner("Thinking..."):
-            response = requests.post(
-                f"{BACKEND_URL}/chat",
-                json={
-                    "message": message,
-                    "conversation_id": st.session_state.conversation_id
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()
+        # The client reports connection and HTTP errors itself and then stops yielding
+        events = get_api_client(BACKEND_URL).stream_message(
+            message,
+            conversation_id=st.session_state.conversation_id
+        )
+        for event in events:
+            if event["type"] == "token":
+                if not reply:
+                    status.update(label="Responding...")
+                reply += event["content"]
+                placeholder.markdown(reply)
+            elif event["type"] == "done":
+                result = event
+                return result
             else:
-                st.error(f"Backend error: {response.status_code}")
+                placeholder.empty()
+                st.error("Backend error: the response could not be generated.")
                 return None
-                
-    except requests.exceptions.ConnectionError:
-        st.error("Cannot connect to backend. Please ensure the backend server is running on http://localhost:8000")
-        return None
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. Please try again.")
-        return None
-    except Exception as e:
-        st.error(f"An error occurred: {str(e)}")
+        
+        if reply:
+            st.error("The response ended unexpectedly. Please try again.")
         return None
+    finally:
+        if result:
+            status.update(label="Done", state="complete")
+        else:
+            status.update(label="No response", state="error")
 
 def display_resources(resources):
     """Display mental health resources"""
     if resources:
         st.markdown("### 📚 Helpful Resources")
-        for resource in resources:
-            st.markdown(f"• {resource}")
+        st.markdown(resource_bullets(tuple(resources)))
+
+# (button label, message sent on click)
+QUICK_ACTIONS = (
+    ("😰 I'm feeling anxious", "I'm feeling really anxious right now and could use some support."),
+    ("😢 I'm feeling sad", "I've been feeling really sad lately and don't know what to do."),
+    ("💪 I need motivation", "I'm struggling to find motivation and could use some encouragement."),
+)
+
+def add_user_message(message):
+    """Record a user message; it stays pending until answer_pending_message sends it"""
+    add_to_history({
+        "message": message,
+        "is_user": True,
+        "pending": True,
+        "timestamp": datetime.now().isoformat()
+    })
+
+def handle_quick_action(prompt):
+    """Queue a quick-action prompt; runs as a button callback, before the rerun that answers it"""
+    add_user_message(prompt)
+
+def answer_pending_message():
+    """Send the latest user message if it hasn't been answered yet and stream the reply"""
+    history = st.session_state.conversation_history
+    if not history or not history[-1].pop("pending", False):
+        return
+    
+    response = send_message(history[-1]["message"])
+    
+    if response:
+        # Add assistant response to history
+        add_to_history({
+            "message": response["response"],
+            "is_user": False,
+            "sentiment": response.get("sentiment"),
+            "crisis_detected": response.get("crisis_detected", False),
+            "timestamp": response.get("timestamp")
+        })
+        
+        # Show resources if crisis detected or user wants to see them
+        if response.get("crisis_detected") or st.session_state.show_resources:
+            if response.get("resources"):
+                st.markdown("---")
+                display_resources(response["resources"])
+
+# Static sidebar text
+ABOUT_MD = """
+MindMate provides empathetic, non-judgmental support for mental wellness. 
+Our AI is trained to:
+- Listen with empathy
+- Provide coping strategies  
+- Detect crisis situations
+- Connect you with resources
+"""
+
+FEATURES_MD = """
+- **Sentiment Analysis**: Real-time emotion detection
+- **Crisis Detection**: Immediate escalation when needed
+- **Coping Strategies**: Practical wellness tips
+- **Resource Connection**: Links to professional help
+"""
 
 def main():
     """Main application"""
@@ -163,36 +218,24 @@ def main():
     # Sidebar
     with st.sidebar:
         st.header("💙 About MindMate")
-        st.markdown("""
-        MindMate provides empathetic, non-judgmental support for mental wellness. 
-        Our AI is trained to:
-        - Listen with empathy
-        - Provide coping strategies  
-        - Detect crisis situations
-        - Connect you with resources
-        """)
+        st.markdown(ABOUT_MD)
         
         st.header("🔧 Features")
-        st.markdown("""
-        - **Sentiment Analysis**: Real-time emotion detection
-        - **Crisis Detection**: Immediate escalation when needed
-        - **Coping Strategies**: Practical wellness tips
-        - **Resource Connection**: Links to professional help
-        """)
+        st.markdown(FEATURES_MD)
         
         if st.button("🗑️ Clear Conversation"):
             try:
-                requests.delete(f"{BACKEND_URL}/conversations/{st.session_state.conversation_id}")
-            except:
+                get_http().delete(
+                    f"{BACKEND_URL}/conversations/{st.session_state.conversation_id}",
+                    timeout=REQUEST_TIMEOUT
+                )
+            except requests.exceptions.RequestException:
                 pass
             st.session_state.conversation_history = []
             st.session_state.conversation_id = f"conv_{int(time.time())}"
             st.rerun()
         
-        if st.checkbox("Show Resources", value=st.session_state.show_resources):
-            st.session_state.show_resources = True
-        else:
-            st.session_state.show_resources = False
+        st.checkbox("Show Resources", key="show_resources")
     
     # Safety disclaimer
     display_safety_disclaimer()
@@ -209,104 +252,20 @@ def main():
             item.get("crisis_detected", False)
         )
     
-    # Message input
-    with st.form("chat_form", clear_on_submit=True):
-        user_message = st.text_area(
-            "Share what's on your mind...", 
-            height=100,
-            placeholder="I'm here to listen. Feel free to share how you're feeling today."
-        )
-        
-        col1, col2 = st.columns([1, 4])
-        with col1:
-            send_button = st.form_submit_button("Send 💙", use_container_width=True)
-        
-        if send_button and user_message.strip():
-            # Add user message to history
-            st.session_state.conversation_history.append({
-                "message": user_message,
-                "is_user": True,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Get response from backend
-            response = send_message(user_message)
-            
-            if response:
-                # Add assistant response to history
-                st.session_state.conversation_history.append({
-                    "message": response["response"],
-                    "is_user": False,
-                    "sentiment": response.get("sentiment"),
-                    "crisis_detected": response.get("crisis_detected", False),
-                    "timestamp": response.get("timestamp")
-                })
-                
-                # Show resources if crisis detected or user wants to see them
-                if response.get("crisis_detected") or st.session_state.show_resources:
-                    if response.get("resources"):
-                        st.markdown("---")
-                        display_resources(response["resources"])
-            
-            st.rerun()
+    # Message input; submitting reruns the script once with the new message
+    user_message = st.chat_input("Share what's on your mind...")
     
-    # Quick action buttons
-    st.markdown("### 🚀 Quick Actions")
-    col1, col2, col3 = st.columns(3)
+    if user_message and user_message.strip():
+        add_user_message(user_message)
+        display_message(user_message, is_user=True)
     
-    with col1:
-        if st.button("😰 I'm feeling anxious"):
-            st.session_state.conversation_history.append({
-                "message": "I'm feeling really anxious right now and could use some support.",
-                "is_user": True,
-                "timestamp": datetime.now().isoformat()
-            })
-            response = send_message("I'm feeling really anxious right now and could use some support.")
-            if response:
-                st.session_state.conversation_history.append({
-                    "message": response["response"],
-                    "is_user": False,
-                    "sentiment": response.get("sentiment"),
-                    "crisis_detected": response.get("crisis_detected", False),
-                    "timestamp": response.get("timestamp")
-                })
-            st.rerun()
+    # Typed messages and quick actions are both answered here
+    answer_pending_message()
     
-    with col2:
-        if st.button("😢 I'm feeling sad"):
-            st.session_state.conversation_history.append({
-                "message": "I've been feeling really sad lately and don't know what to do.",
-                "is_user": True,
-                "timestamp": datetime.now().isoformat()
-            })
-            response = send_message("I've been feeling really sad lately and don't know what to do.")
-            if response:
-                st.session_state.conversation_history.append({
-                    "message": response["response"],
-                    "is_user": False,
-                    "sentiment": response.get("sentiment"),
-                    "crisis_detected": response.get("crisis_detected", False),
-                    "timestamp": response.get("timestamp")
-                })
-            st.rerun()
-    
-    with col3:
-        if st.button("💪 I need motivation"):
-            st.session_state.conversation_history.append({
-                "message": "I'm struggling to find motivation and could use some encouragement.",
-                "is_user": True,
-                "timestamp": datetime.now().isoformat()
-            })
-            response = send_message("I'm struggling to find motivation and could use some encouragement.")
-            if response:
-                st.session_state.conversation_history.append({
-                    "message": response["response"],
-                    "is_user": False,
-                    "sentiment": response.get("sentiment"),
-                    "crisis_detected": response.get("crisis_detected", False),
-                    "timestamp": response.get("timestamp")
-                })
-            st.rerun()
+    # Quick action buttons
+    st.markdown("### 🚀 Quick Actions")
+    for col, (label, prompt) in zip(st.columns(len(QUICK_ACTIONS)), QUICK_ACTIONS):
+        col.button(label, on_click=handle_quick_action, args=(prompt,))
     
     # Footer
     st.markdown("---")
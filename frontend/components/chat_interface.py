@@ -1,65 +1,100 @@
 import streamlit as st
+import html
+from functools import lru_cache
 from typing import List, Dict, Any
-from datetime import datetime
 
-def render_message(message: str, is_user: bool, sentiment: Dict = None, crisis_detected: bool = False):
-    """Render a single chat message with appropriate styling"""
-    
-    if is_user:
-        st.markdown(f"""
+# Message markup, formatted per message with format_map
+_USER_TEMPLATE = """
         <div style="display: flex; justify-content: flex-end; margin: 10px 0;">
             <div style="background-color: #E3F2FD; padding: 15px; border-radius: 15px 15px 5px 15px; max-width: 80%; margin-left: 20%;">
                 <strong>You:</strong><br/>
                 {message}
             </div>
         </div>
-        """, unsafe_allow_html=True)
-    else:
-        # Assistant message
-        crisis_indicator = ""
-        if crisis_detected:
-            crisis_indicator = """
+        """
+
+_ASSISTANT_TEMPLATE = """
+        <div style="display: flex; justify-content: flex-start; margin: 10px 0;">
+            <div style="background-color: #F1F8E9; padding: 15px; border-radius: 15px 15px 15px 5px; max-width: 80%; margin-right: 20%;">
+                <strong>🧠 MindMate:</strong><br/>
+                {message}
+                {sentiment_badge}
+                {crisis_indicator}
+            </div>
+        </div>
+        """
+
+_CRISIS_INDICATOR_HTML = """
             <div style="background-color: #FFEBEE; border: 2px solid #F44336; border-radius: 8px; padding: 10px; margin: 5px 0;">
                 <strong>⚠️ Crisis Response Activated</strong><br/>
                 <small>This response includes emergency resources and support information.</small>
             </div>
             """
-        
-        sentiment_badge = ""
-        if sentiment:
-            sentiment_color = {
-                'positive': '#C8E6C9',
-                'negative': '#FFCDD2', 
-                'neutral': '#E0E0E0'
-            }.get(sentiment.get('label', 'neutral'), '#E0E0E0')
-            
-            sentiment_text_color = {
-                'positive': '#2E7D32',
-                'negative': '#C62828',
-                'neutral': '#424242'
-            }.get(sentiment.get('label', 'neutral'), '#424242')
-            
-            confidence = sentiment.get('confidence', 0) * 100
-            
-            sentiment_badge = f"""
+
+_SENTIMENT_BADGE_TEMPLATE = """
             <div style="margin: 5px 0;">
-                <span style="background-color: {sentiment_color}; color: {sentiment_text_color}; 
+                <span style="background-color: {background}; color: {color}; 
                            padding: 4px 8px; border-radius: 12px; font-size: 0.8em;">
-                    Sentiment: {sentiment.get('label', 'neutral').title()} ({confidence:.0f}%)
+                    Sentiment: {label} ({confidence}%)
                 </span>
             </div>
             """
-        
-        st.markdown(f"""
-        <div style="display: flex; justify-content: flex-start; margin: 10px 0;">
-            <div style="background-color: #F1F8E9; padding: 15px; border-radius: 15px 15px 15px 5px; max-width: 80%; margin-right: 20%;">
-                <strong>🧠 MindMate:</strong><br/>
-                {message}
-                {sentiment_badge}
-                {crisis_indicator}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+
+# Sentiment label -> (badge background, text color)
+_SENTIMENT_COLORS = {
+    'positive': ('#C8E6C9', '#2E7D32'),
+    'negative': ('#FFCDD2', '#C62828'),
+    'neutral': ('#E0E0E0', '#424242')
+}
+
+@lru_cache(maxsize=512)
+def _badge_html(label: str, confidence_pct: int) -> str:
+    """Sentiment badge markup; only a few hundred label/percentage pairs exist"""
+    background, color = _SENTIMENT_COLORS.get(label, _SENTIMENT_COLORS['neutral'])
+    return _SENTIMENT_BADGE_TEMPLATE.format_map({
+        "background": background,
+        "color": color,
+        "label": label.title(),
+        "confidence": confidence_pct
+    })
+
+def _sentiment_badge_html(sentiment: Dict) -> str:
+    """Sentiment badge markup for an assistant message"""
+    return _badge_html(sentiment.get('label', 'neutral'), round(sentiment.get('confidence', 0) * 100))
+
+@lru_cache(maxsize=1024)
+def message_to_html(message: str) -> str:
+    """Escape message text for the HTML templates, keeping its line breaks"""
+    return html.escape(message).replace("\n", "<br/>")
+
+def message_markup(
+    message: str,
+    is_user: bool,
+    sentiment: Dict = None,
+    crisis_detected: bool = False
+) -> str:
+    """Styled HTML for a single chat message"""
+    message_html = message_to_html(message)
+    
+    if is_user:
+        markup = _USER_TEMPLATE.format_map({"message": message_html})
+    else:
+        markup = _ASSISTANT_TEMPLATE.format_map({
+            "message": message_html,
+            "sentiment_badge": _sentiment_badge_html(sentiment) if sentiment else "",
+            "crisis_indicator": _CRISIS_INDICATOR_HTML if crisis_detected else ""
+        })
+    
+    return markup
+
+def render_message(
+    message: str,
+    is_user: bool,
+    sentiment: Dict = None,
+    crisis_detected: bool = False
+):
+    """Render a single chat message with appropriate styling"""
+    st.markdown(message_markup(message, is_user, sentiment, crisis_detected), unsafe_allow_html=True)
 
 def render_chat_history(conversation_history: List[Dict[str, Any]]):
     """Render the complete chat history"""
@@ -73,17 +108,20 @@ def render_chat_history(conversation_history: List[Dict[str, Any]]):
         """, unsafe_allow_html=True)
         return
     
+    # The whole transcript goes out as one markdown element rather than one per message
+    parts = []
     for message_data in conversation_history:
-        render_message(
+        parts.append(message_markup(
             message=message_data["message"],
             is_user=message_data["is_user"],
             sentiment=message_data.get("sentiment"),
             crisis_detected=message_data.get("crisis_detected", False)
-        )
+        ))
+    
+    st.markdown("\n".join(parts), unsafe_allow_html=True)
 
-def render_typing_indicator():
-    """Show typing indicator while waiting for response"""
-    st.markdown("""
+# Typing indicator markup and its animation, built once per process
+_TYPING_INDICATOR_HTML = """
     <div style="display: flex; justify-content: flex-start; margin: 10px 0;">
         <div style="background-color: #F1F8E9; padding: 15px; border-radius: 15px 15px 15px 5px;">
             <strong>🧠 MindMate:</strong><br/>
@@ -118,37 +156,34 @@ def render_typing_indicator():
         40% { transform: scale(1); }
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def render_typing_indicator():
+    """Show typing indicator while waiting for response"""
+    st.markdown(_TYPING_INDICATOR_HTML, unsafe_allow_html=True)
+
+# (action key, button label, message sent on click)
+QUICK_ACTIONS = (
+    ("anxious", "😰 Feeling Anxious", "I'm feeling really anxious right now and could use some support."),
+    ("sad", "😢 Feeling Sad", "I've been feeling really sad lately and don't know what to do."),
+    ("motivation", "💪 Need Motivation", "I'm struggling to find motivation and could use some encouragement."),
+    ("sleep", "😴 Sleep Issues", "I've been having trouble sleeping and it's affecting my mood."),
+    ("coping", "🧘 Want Coping Tips", "Can you share some coping strategies for managing stress?"),
+    ("talk", "💬 Just Talk", "I just need someone to talk to about how I'm feeling."),
+)
 
 def render_quick_actions():
     """Render quick action buttons for common scenarios"""
     st.markdown("### 🚀 Quick Actions")
     st.markdown("*Click any button below to start a conversation*")
     
-    col1, col2, col3 = st.columns(3)
-    
+    columns = st.columns(3)
     actions = []
     
-    with col1:
-        if st.button("😰 Feeling Anxious", use_container_width=True):
-            actions.append(("anxious", "I'm feeling really anxious right now and could use some support."))
-        
-        if st.button("😢 Feeling Sad", use_container_width=True):
-            actions.append(("sad", "I've been feeling really sad lately and don't know what to do."))
-    
-    with col2:
-        if st.button("💪 Need Motivation", use_container_width=True):
-            actions.append(("motivation", "I'm struggling to find motivation and could use some encouragement."))
-        
-        if st.button("😴 Sleep Issues", use_container_width=True):
-            actions.append(("sleep", "I've been having trouble sleeping and it's affecting my mood."))
-    
-    with col3:
-        if st.button("🧘 Want Coping Tips", use_container_width=True):
-            actions.append(("coping", "Can you share some coping strategies for managing stress?"))
-        
-        if st.button("💬 Just Talk", use_container_width=True):
-            actions.append(("talk", "I just need someone to talk to about how I'm feeling."))
+    # Two buttons per column, filled column by column
+    for i, (key, label, prompt) in enumerate(QUICK_ACTIONS):
+        if columns[i // 2].button(label, use_container_width=True):
+            actions.append((key, prompt))
     
     return actions
 
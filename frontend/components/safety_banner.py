@@ -1,4 +1,8 @@
 import streamlit as st
+import random
+from datetime import datetime, timezone
+
+from utils.helpers import resource_bullets
 
 def render_safety_disclaimer():
     """Render the main safety disclaimer banner"""
@@ -70,8 +74,7 @@ def render_crisis_alert(resources=None):
     # Show additional resources if provided
     if resources:
         st.markdown("### 📚 Additional Resources")
-        for resource in resources:
-            st.markdown(f"• {resource}")
+        st.markdown(resource_bullets(tuple(resources)))
 
 def render_resource_panel(resources=None, show_extended=False):
     """Render mental health resources panel"""
@@ -83,8 +86,7 @@ def render_resource_panel(resources=None, show_extended=False):
     
     if resources:
         st.markdown("**Recommended for you:**")
-        for resource in resources:
-            st.markdown(f"• {resource}")
+        st.markdown(resource_bullets(tuple(resources)))
     
     if show_extended:
         with st.expander("🔍 Find More Resources"):
@@ -124,23 +126,29 @@ def render_resource_panel(resources=None, show_extended=False):
                 - Online therapy platforms
                 """)
 
+WELLBEING_TIPS = (
+    "🧘 Take 5 deep breaths: In for 4, hold for 4, out for 6",
+    "🚶 Go for a short walk, even just around the block",
+    "💧 Drink a glass of water and notice how it tastes",
+    "📱 Reach out to one person you care about",
+    "✍️ Write down three things you're grateful for",
+    "🌱 Spend a few minutes in nature or looking at plants",
+    "🎵 Listen to a song that makes you feel peaceful",
+    "🛁 Take a warm shower or bath mindfully",
+    "📚 Read something inspiring for 10 minutes",
+    "😊 Practice smiling - it can actually improve mood"
+)
+
+@st.cache_data(ttl=86400)
+def _daily_tip(day: str) -> str:
+    """Pick the tip once per day, so it doesn't change on every rerun"""
+    # day is unused here; it only keys the cache so a new day picks a new tip
+    return random.choice(WELLBEING_TIPS)
+
 def render_wellbeing_tips():
     """Render daily wellbeing tips"""
-    tips = [
-        "🧘 Take 5 deep breaths: In for 4, hold for 4, out for 6",
-        "🚶 Go for a short walk, even just around the block",
-        "💧 Drink a glass of water and notice how it tastes",
-        "📱 Reach out to one person you care about",
-        "✍️ Write down three things you're grateful for",
-        "🌱 Spend a few minutes in nature or looking at plants",
-        "🎵 Listen to a song that makes you feel peaceful",
-        "🛁 Take a warm shower or bath mindfully",
-        "📚 Read something inspiring for 10 minutes",
-        "😊 Practice smiling - it can actually improve mood"
-    ]
-    
-    import random
-    daily_tip = random.choice(tips)
+    # UTC, so every session on the server rolls over at the same moment
+    daily_tip = _daily_tip(datetime.now(timezone.utc).date().isoformat())
     
     st.markdown(f"""
     <div style="background: linear-gradient(90deg, #E8F5E8 0%, #F1F8E9 100%); 
@@ -1,7 +1,8 @@
 import streamlit as st
-import requests
 from typing import Optional
 
+from utils.api_client import get_api_client
+
 def render_sidebar(conversation_id: str, backend_url: str) -> Optional[str]:
     """Render the sidebar with app information and controls"""
     
@@ -32,13 +33,13 @@ def render_sidebar(conversation_id: str, backend_url: str) -> Optional[str]:
         st.markdown("---")
         st.subheader("🔧 Features")
         
-        feature_status = get_system_status(backend_url)
+        # Health and stats arrive together in one request
+        bootstrap = get_sidebar_bootstrap(backend_url, conversation_id)
+        backend_connected = bootstrap["health"].get("backend_connected", False)
         
         st.markdown("**AI Capabilities:**")
-        status_icon = "✅" if feature_status.get("sentiment_available", False) else "⚠️"
+        status_icon = "✅" if backend_connected else "⚠️"
         st.markdown(f"{status_icon} Sentiment Analysis")
-        
-        status_icon = "✅" if feature_status.get("llm_available", False) else "⚠️"
         st.markdown(f"{status_icon} Intelligent Responses")
         
         st.markdown(f"✅ Crisis Detection")
@@ -49,14 +50,12 @@ def render_sidebar(conversation_id: str, backend_url: str) -> Optional[str]:
         st.subheader("🗨️ Conversation")
         
         if st.button("🗑️ Clear Conversation", use_container_width=True):
-            try:
-                response = requests.delete(f"{backend_url}/conversations/{conversation_id}")
-                if response.status_code == 200:
-                    st.success("Conversation cleared!")
-                    return "clear_chat"
-            except:
-                st.warning("Could not clear conversation on server")
-                return "clear_chat"
+            # The client reports a server-side failure; the chat is cleared locally either way
+            if get_api_client(backend_url).clear_conversation(conversation_id):
+                st.success("Conversation cleared!")
+            # Don't show the cleared conversation's stats for the rest of the cache TTL
+            get_sidebar_bootstrap.clear()
+            return "clear_chat"
         
         # Settings
         st.markdown("---")
@@ -66,12 +65,14 @@ def render_sidebar(conversation_id: str, backend_url: str) -> Optional[str]:
         show_resources = st.checkbox("Show resources panel", value=False)
         
         # Statistics (if available)
-        stats = get_conversation_stats(backend_url)
+        stats = bootstrap["stats"]
         if stats:
             st.markdown("---")
             st.subheader("📊 Session Stats")
-            st.metric("Messages sent", stats.get("message_count", 0))
-            st.metric("Average sentiment", f"{stats.get('avg_sentiment', 0):.2f}")
+            # The backend keeps only the most recent messages of a conversation
+            st.metric("Recent messages", stats.get("message_count", 0))
+            if "avg_sentiment" in stats:
+                st.metric("Average sentiment", f"{stats['avg_sentiment']:.2f}")
         
         # Emergency resources
         st.markdown("---")
@@ -114,33 +115,10 @@ def render_emergency_resources():
         - SAMHSA National Helpline: 1-800-662-4357
         """)
 
-def get_system_status(backend_url: str) -> dict:
-    """Get system status from backend"""
-    try:
-        response = requests.get(f"{backend_url}/health", timeout=5)
-        if response.status_code == 200:
-            return {
-                "sentiment_available": True,
-                "llm_available": True,
-                "backend_connected": True
-            }
-    except:
-        pass
-    
-    return {
-        "sentiment_available": False,
-        "llm_available": False,
-        "backend_connected": False
-    }
-
-def get_conversation_stats(backend_url: str) -> dict:
-    """Get conversation statistics"""
-    try:
-        # This would need an endpoint to get session stats
-        # For now, return empty dict
-        return {}
-    except:
-        return {}
+@st.cache_data(ttl=10, show_spinner=False)
+def get_sidebar_bootstrap(backend_url: str, conversation_id: str) -> dict:
+    """Get system status and conversation statistics, reused across rapid reruns"""
+    return get_api_client(backend_url).get_sidebar_bootstrap(conversation_id)
 
 def render_feedback_form():
     """Render feedback form in sidebar"""
@@ -1,21 +1,37 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 import json
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
 import streamlit as st
 import logging
-from datetime import datetime
 import time
 
 logger = logging.getLogger(__name__)
 
+# Most messages the backend's /chat/batch accepts in one request
+MAX_BATCH_MESSAGES = 20
+
 class MindMateAPIClient:
     """Client for communicating with MindMate backend API"""
     
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url.rstrip('/')
         self.session = requests.Session()
+        
+        # The cached client is shared by every session in the process, so keep a pool of
+        # connections to the backend; only idempotent requests are retried on gateway errors
+        retry = Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=["GET", "DELETE"]
+        )
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # requests sets Content-Type itself on json= bodies
         self.session.headers.update({
-            'Content-Type': 'application/json',
             'User-Agent': 'MindMate-Frontend/1.0'
         })
         self._last_health_check = None
@@ -122,19 +138,74 @@ class MindMateAPIClient:
             logger.error(f"API call failed: {str(e)}")
             return None
     
+    def stream_message(
+        self,
+        message: str,
+        conversation_id: Optional[str] = None,
+        user_id: str = "anonymous"
+    ) -> Iterator[Dict[str, Any]]:
+        """Send a message and yield the reply as it is generated: token events, then one done event"""
+        if not message.strip():
+            st.error("Please enter a message before sending.")
+            return
+        
+        payload = {
+            "message": message.strip(),
+            "user_id": user_id
+        }
+        
+        if conversation_id:
+            payload["conversation_id"] = conversation_id
+        
+        try:
+            with self.session.post(
+                f"{self.base_url}/chat/stream",
+                json=payload,
+                timeout=(3.05, 120),
+                stream=True
+            ) as response:
+                if response.status_code in (404, 406, 415):
+                    # Backend without streaming: answer through /chat in one piece
+                    result = self.send_message(message, conversation_id=conversation_id, user_id=user_id)
+                    if result:
+                        yield {"type": "token", "content": result["response"]}
+                        yield {"type": "done", **result}
+                    return
+                
+                response.raise_for_status()
+                
+                # Server-sent events, one "data: {json}" line each
+                for line in response.iter_lines(chunk_size=None):
+                    if line.startswith(b"data: "):
+                        yield json.loads(line[len(b"data: "):])
+            
+        except requests.exceptions.ConnectionError:
+            st.error("❌ Cannot connect to backend. Please ensure the server is running on http://localhost:8000")
+        except requests.exceptions.Timeout:
+            st.error("⏰ Request timed out. The server might be overloaded. Please try again.")
+        except requests.exceptions.HTTPError as e:
+            st.error(f"❌ HTTP error: {e.response.status_code}")
+        except requests.exceptions.RequestException as e:
+            # e.g. the connection dropping mid-stream
+            st.error(f"❌ Request failed: {str(e)}")
+        except json.JSONDecodeError:
+            st.error("⚠️ Invalid response from server. Please try again.")
+    
     def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         """Get conversation history"""
         try:
-            response = self.session.get(
+            with self.session.get(
                 f"{self.base_url}/conversations/{conversation_id}",
-                timeout=10
-            )
-            
-            if response.status_code == 404:
-                return None
-            
-            response.raise_for_status()
-            return response.json()
+                timeout=10,
+                stream=True
+            ) as response:
+                if response.status_code == 404:
+                    return None
+                
+                response.raise_for_status()
+                # Parse straight off the socket instead of buffering the whole body first
+                response.raw.decode_content = True
+                return json.load(response.raw)
             
         except Exception as e:
             logger.error(f"Failed to get conversation {conversation_id}: {str(e)}")
@@ -160,6 +231,35 @@ class MindMateAPIClient:
             st.error("Failed to clear conversation on server")
             return False
     
+    def get_sidebar_bootstrap(self, conversation_id: Optional[str] = None) -> Dict[str, Any]:
+        """Health and conversation stats for the sidebar, in one request when the backend supports it"""
+        try:
+            response = self.session.get(
+                f"{self.base_url}/session/bootstrap",
+                params={"conversation_id": conversation_id} if conversation_id else None,
+                timeout=5
+            )
+            
+            if response.status_code != 404:
+                response.raise_for_status()
+                data = response.json()
+                
+                # Shares the result with health_check's 30-second cache
+                self._health_status = {
+                    "status": "healthy",
+                    "backend_connected": True,
+                    "data": data["health"],
+                    "response_time": response.elapsed.total_seconds()
+                }
+                self._last_health_check = time.time()
+                return {"health": self._health_status, "stats": data.get("stats")}
+            
+        except Exception as e:
+            logger.error(f"Failed to get sidebar bootstrap: {str(e)}")
+        
+        # Older backends without /session/bootstrap, or a failed call: health_check reports the error
+        return {"health": self.health_check(), "stats": None}
+    
     def get_api_info(self) -> Dict[str, Any]:
         """Get API information and available endpoints"""
         try:
@@ -193,12 +293,49 @@ class MindMateAPIClient:
             logger.error(f"Failed to get conversation stats: {str(e)}")
             return None
     
-    def batch_send_messages(
-        self, 
-        messages: List[str], 
+    def send_message_batch(
+        self,
+        messages: List[str],
+        conversation_id: Optional[str] = None,
+        user_id: str = "anonymous"
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Send up to MAX_BATCH_MESSAGES non-blank messages in one request; the server answers them in order"""
+        start_time = time.time()
+        
+        payload = {
+            "messages": [message.strip() for message in messages],
+            "user_id": user_id
+        }
+        
+        if conversation_id:
+            payload["conversation_id"] = conversation_id
+        
+        response = self.session.post(
+            f"{self.base_url}/chat/batch",
+            json=payload,
+            timeout=max(30, 5 * len(messages))
+        )
+        
+        # Older backends have no batch endpoint (404), and a batch the server won't take as a
+        # whole (e.g. 422 for one over-long message) can still be answered message by message
+        if 400 <= response.status_code < 500:
+            return None
+        
+        response.raise_for_status()
+        results = response.json()["responses"]
+        
+        response_time = time.time() - start_time
+        for result in results:
+            result["response_time"] = response_time
+        
+        return results
+    
+    def _send_each(
+        self,
+        messages: List[str],
         conversation_id: Optional[str] = None
     ) -> List[Optional[Dict[str, Any]]]:
-        """Send multiple messages in sequence"""
+        """Send messages one request at a time"""
         results = []
         for message in messages:
             result = self.send_message(
@@ -212,6 +349,36 @@ class MindMateAPIClient:
                 time.sleep(0.5)
         
         return results
+    
+    def batch_send_messages(
+        self, 
+        messages: List[str], 
+        conversation_id: Optional[str] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Send multiple messages, in batch requests when the backend supports them"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        
+        # Blank messages are never sent (the backend rejects them); their results stay None
+        pending = [(i, message) for i, message in enumerate(messages) if message.strip()]
+        
+        for start in range(0, len(pending), MAX_BATCH_MESSAGES):
+            chunk = pending[start:start + MAX_BATCH_MESSAGES]
+            chunk_messages = [message for _, message in chunk]
+            
+            try:
+                chunk_results = self.send_message_batch(chunk_messages, conversation_id=conversation_id)
+            except Exception as e:
+                logger.error(f"Batch send failed: {str(e)}")
+                st.error("❌ Could not send the messages. Please try again.")
+                return results
+            
+            if chunk_results is None:
+                chunk_results = self._send_each(chunk_messages, conversation_id=conversation_id)
+            
+            for (i, _), result in zip(chunk, chunk_results):
+                results[i] = result
+        
+        return results
 
 # Global API client instance
 @st.cache_resource
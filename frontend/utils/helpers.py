@@ -1,15 +1,34 @@
 import streamlit as st
 import re
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple
-import hashlib
 import json
+import random
+import secrets
 import time
 
-def format_timestamp(timestamp_str: str) -> str:
-    """Format timestamp for display"""
+_URL_PATTERN = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+
+_WS_RE = re.compile(r'\s+')
+_SCRIPT_RE = re.compile(r'<script.*?</script>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<.*?>')
+_URL_RE = re.compile(_URL_PATTERN)
+
+# Spam: runs of repeated characters, or URLs in any case
+_REPEAT_RE = re.compile(r'(.)\1{10,}')
+_SPAM_URL_RE = re.compile(_URL_PATTERN, re.IGNORECASE)
+
+@lru_cache(maxsize=2048)
+def _parse_iso(timestamp_str: str) -> datetime:
+    """Parse an ISO 8601 timestamp, once per distinct string"""
+    return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+
+@lru_cache(maxsize=4096)
+def _format_timestamp(timestamp_str: str, minute: int) -> str:
+    """Relative time for a timestamp, cached for the current minute"""
     try:
-        dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+        dt = _parse_iso(timestamp_str)
         now = datetime.now(dt.tzinfo)
         
         diff = now - dt
@@ -27,6 +46,11 @@ def format_timestamp(timestamp_str: str) -> str:
     except Exception:
         return timestamp_str
 
+def format_timestamp(timestamp_str: str) -> str:
+    """Format timestamp for display"""
+    # The output has minute granularity, so results are reused within a minute
+    return _format_timestamp(timestamp_str, int(time.time()) // 60)
+
 def format_sentiment_score(score: float) -> Tuple[str, str]:
     """Format sentiment score for display"""
     if score > 0.1:
@@ -50,40 +74,37 @@ def get_sentiment_emoji(sentiment_label: str) -> str:
 def clean_message(message: str) -> str:
     """Clean and sanitize user message"""
     # Remove excessive whitespace
-    message = re.sub(r'\s+', ' ', message.strip())
+    message = _WS_RE.sub(' ', message.strip())
     
     # Remove potentially harmful content (basic)
-    message = re.sub(r'<script.*?</script>', '', message, flags=re.IGNORECASE | re.DOTALL)
-    message = re.sub(r'<.*?>', '', message)  # Remove HTML tags
+    if '<' in message:
+        message = _SCRIPT_RE.sub('', message)
+        message = _TAG_RE.sub('', message)  # Remove HTML tags
     
     return message
 
 def generate_conversation_id() -> str:
     """Generate a unique conversation ID"""
-    timestamp = str(int(time.time() * 1000))
-    random_part = hashlib.md5(timestamp.encode()).hexdigest()[:8]
-    return f"conv_{timestamp}_{random_part}"
+    return f"conv_{int(time.time() * 1000)}_{secrets.token_hex(4)}"
 
 def validate_message(message: str) -> Tuple[bool, Optional[str]]:
     """Validate user message"""
-    if not message or not message.strip():
+    stripped = message.strip() if message else ""
+    if not stripped:
         return False, "Message cannot be empty"
     
     if len(message) > 2000:
         return False, "Message is too long (max 2000 characters)"
     
-    if len(message.strip()) < 2:
+    if len(stripped) < 2:
         return False, "Message is too short"
     
-    # Check for spam patterns
-    spam_patterns = [
-        r'(.)\1{10,}',  # Repeated characters
-        r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',  # URLs
-    ]
+    # Check for spam patterns; the URL regex only runs if the message could hold a URL
+    if _REPEAT_RE.search(message):
+        return False, "Message contains inappropriate content"
     
-    for pattern in spam_patterns:
-        if re.search(pattern, message, re.IGNORECASE):
-            return False, "Message contains inappropriate content"
+    if 'http' in message.lower() and _SPAM_URL_RE.search(message):
+        return False, "Message contains inappropriate content"
     
     return True, None
 
@@ -94,64 +115,94 @@ def format_response_time(response_time: float) -> str:
     else:
         return f"{response_time:.1f}s"
 
-def get_crisis_keywords() -> List[str]:
+_CRISIS_KEYWORDS: Tuple[str, ...] = (
+    "suicide", "kill myself", "end my life", "want to die",
+    "hurt myself", "cut myself", "self harm", "overdose",
+    "not worth living", "better off dead", "end it all"
+)
+
+def _build_crisis_automaton(keywords: Tuple[str, ...]):
+    """Aho-Corasick automaton over the crisis keywords, if pyahocorasick is installed"""
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+_CRISIS_AUTOMATON = _build_crisis_automaton(_CRISIS_KEYWORDS)
+_CRISIS_RE = re.compile("|".join(map(re.escape, _CRISIS_KEYWORDS)))
+
+def get_crisis_keywords() -> Tuple[str, ...]:
     """Get list of crisis keywords for client-side awareness"""
-    return [
-        "suicide", "kill myself", "end my life", "want to die",
-        "hurt myself", "cut myself", "self harm", "overdose",
-        "not worth living", "better off dead", "end it all"
-    ]
+    return _CRISIS_KEYWORDS
 
 def contains_crisis_keywords(message: str) -> bool:
     """Check if message contains crisis keywords (client-side check)"""
     message_lower = message.lower()
-    crisis_keywords = get_crisis_keywords()
     
-    return any(keyword in message_lower for keyword in crisis_keywords)
+    # One pass over the message for all keywords
+    if _CRISIS_AUTOMATON is not None:
+        return next(_CRISIS_AUTOMATON.iter(message_lower), None) is not None
+    return _CRISIS_RE.search(message_lower) is not None
 
 def format_message_for_display(message: str) -> str:
     """Format message for better display"""
     # Convert newlines to HTML breaks
-    message = message.replace('\n', '<br>')
+    if '\n' in message:
+        message = message.replace('\n', '<br>')
     
-    # Make URLs clickable
-    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-    message = re.sub(url_pattern, r'<a href="\g<0>" target="_blank">\g<0></a>', message)
-    
-    return message
+    # Make URLs clickable; most messages have none, so skip the regex
+    if 'http' not in message:
+        return message
+    return _URL_RE.sub(r'<a href="\g<0>" target="_blank">\g<0></a>', message)
+
+# Template for empty conversations; handed out as a copy
+_EMPTY_SUMMARY: Dict[str, Any] = {
+    "message_count": 0,
+    "user_messages": 0,
+    "assistant_messages": 0,
+    "avg_sentiment": 0.0,
+    "crisis_detected": False,
+    "duration": "0 minutes"
+}
 
 def get_conversation_summary(conversation_history: List[Dict]) -> Dict[str, Any]:
     """Generate conversation summary statistics"""
     if not conversation_history:
-        return {
-            "message_count": 0,
-            "user_messages": 0,
-            "assistant_messages": 0,
-            "avg_sentiment": 0.0,
-            "crisis_detected": False,
-            "duration": "0 minutes"
-        }
-    
-    user_messages = [msg for msg in conversation_history if msg.get("is_user", False)]
-    assistant_messages = [msg for msg in conversation_history if not msg.get("is_user", False)]
+        return dict(_EMPTY_SUMMARY)
     
-    # Calculate average sentiment from assistant messages
-    sentiments = []
+    # One pass: count both sides and average sentiment over assistant messages
+    user_count = assistant_count = sentiment_count = 0
+    sentiment_sum = 0.0
     crisis_detected = False
     
-    for msg in assistant_messages:
-        if msg.get("sentiment"):
-            sentiments.append(msg["sentiment"].get("score", 0))
-        if msg.get("crisis_detected", False):
+    for msg in conversation_history:
+        get = msg.get
+        if get("is_user", False):
+            user_count += 1
+            continue
+        
+        assistant_count += 1
+        sentiment = get("sentiment")
+        if sentiment:
+            sentiment_sum += sentiment.get("score", 0)
+            sentiment_count += 1
+        if get("crisis_detected", False):
             crisis_detected = True
     
-    avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0.0
+    avg_sentiment = sentiment_sum / sentiment_count if sentiment_count else 0.0
     
     # Calculate duration
     if len(conversation_history) >= 2:
         try:
-            first_time = datetime.fromisoformat(conversation_history[0].get("timestamp", ""))
-            last_time = datetime.fromisoformat(conversation_history[-1].get("timestamp", ""))
+            # History is append-only, so these parses are cached across reruns
+            first_time = _parse_iso(conversation_history[0].get("timestamp", ""))
+            last_time = _parse_iso(conversation_history[-1].get("timestamp", ""))
             duration_minutes = (last_time - first_time).seconds // 60
             duration = f"{duration_minutes} minutes" if duration_minutes > 0 else "Less than a minute"
         except:
@@ -161,55 +212,44 @@ def get_conversation_summary(conversation_history: List[Dict]) -> Dict[str, Any]
     
     return {
         "message_count": len(conversation_history),
-        "user_messages": len(user_messages),
-        "assistant_messages": len(assistant_messages),
+        "user_messages": user_count,
+        "assistant_messages": assistant_count,
         "avg_sentiment": avg_sentiment,
         "crisis_detected": crisis_detected,
         "duration": duration
     }
 
+_WELLBEING_TIPS: Tuple[str, ...] = (
+    "🧘 Take 5 deep breaths: In for 4, hold for 4, out for 6",
+    "🚶 Go for a short walk, even just around the block",
+    "💧 Drink a glass of water and notice how it tastes",
+    "📱 Reach out to one person you care about",
+    "✍️ Write down three things you're grateful for",
+    "🌱 Spend a few minutes in nature or looking at plants",
+    "🎵 Listen to a song that makes you feel peaceful",
+    "🛁 Take a warm shower or bath mindfully",
+    "📚 Read something inspiring for 10 minutes",
+    "😊 Practice smiling - it can actually improve mood",
+    "🧘‍♀️ Try the 5-4-3-2-1 grounding technique",
+    "☕ Make a cup of tea and savor it slowly",
+    "🎨 Do something creative for 15 minutes",
+    "📞 Call someone who makes you laugh",
+    "🌅 Watch the sunrise or sunset mindfully"
+)
+
 def get_wellbeing_tip() -> str:
     """Get a random wellbeing tip"""
-    tips = [
-        "🧘 Take 5 deep breaths: In for 4, hold for 4, out for 6",
-        "🚶 Go for a short walk, even just around the block",
-        "💧 Drink a glass of water and notice how it tastes",
-        "📱 Reach out to one person you care about",
-        "✍️ Write down three things you're grateful for",
-        "🌱 Spend a few minutes in nature or looking at plants",
-        "🎵 Listen to a song that makes you feel peaceful",
-        "🛁 Take a warm shower or bath mindfully",
-        "📚 Read something inspiring for 10 minutes",
-        "😊 Practice smiling - it can actually improve mood",
-        "🧘‍♀️ Try the 5-4-3-2-1 grounding technique",
-        "☕ Make a cup of tea and savor it slowly",
-        "🎨 Do something creative for 15 minutes",
-        "📞 Call someone who makes you laugh",
-        "🌅 Watch the sunrise or sunset mindfully"
-    ]
-    
-    import random
-    return random.choice(tips)
+    return random.choice(_WELLBEING_TIPS)
 
-def create_status_indicator(status: str) -> str:
-    """Create HTML status indicator"""
-    status_colors = {
-        "healthy": "#4CAF50",
-        "warning": "#FF9800", 
-        "error": "#f44336",
-        "offline": "#757575"
-    }
-    
-    status_icons = {
-        "healthy": "✅",
-        "warning": "⚠️",
-        "error": "❌", 
-        "offline": "⚪"
-    }
-    
-    color = status_colors.get(status, "#757575")
-    icon = status_icons.get(status, "⚪")
-    
+_STATUS_STYLES: Dict[str, Tuple[str, str]] = {
+    "healthy": ("#4CAF50", "✅"),
+    "warning": ("#FF9800", "⚠️"),
+    "error": ("#f44336", "❌"),
+    "offline": ("#757575", "⚪")
+}
+
+def _status_html(status: str, color: str, icon: str) -> str:
+    """HTML for one status indicator"""
     return f"""
     <div style="display: inline-flex; align-items: center; gap: 5px;">
         <span style="color: {color};">{icon}</span>
@@ -217,6 +257,18 @@ def create_status_indicator(status: str) -> str:
     </div>
     """
 
+_STATUS_HTML: Dict[str, str] = {
+    status: _status_html(status, color, icon) for status, (color, icon) in _STATUS_STYLES.items()
+}
+
+def create_status_indicator(status: str) -> str:
+    """Create HTML status indicator"""
+    html = _STATUS_HTML.get(status)
+    if html is None:
+        # Unknown statuses still show their own name, styled as offline
+        html = _status_html(status, *_STATUS_STYLES["offline"])
+    return html
+
 def save_conversation_locally(conversation_history: List[Dict], conversation_id: str):
     """Save conversation to browser local storage (if supported)"""
     try:
@@ -257,24 +309,24 @@ def export_conversation_json(conversation_history: List[Dict], conversation_id:
     
     return json.dumps(export_data, indent=2, ensure_ascii=False)
 
-def get_quick_responses() -> List[Tuple[str, str]]:
+_QUICK_RESPONSES: Tuple[Tuple[str, str], ...] = (
+    ("😰 Feeling Anxious", "I'm feeling really anxious right now and could use some support."),
+    ("😢 Feeling Sad", "I've been feeling really sad lately and don't know what to do."),
+    ("💪 Need Motivation", "I'm struggling to find motivation and could use some encouragement."),
+    ("😴 Sleep Issues", "I've been having trouble sleeping and it's affecting my mood."),
+    ("🧘 Want Coping Tips", "Can you share some coping strategies for managing stress?"),
+    ("💬 Just Talk", "I just need someone to talk to about how I'm feeling."),
+    ("🏠 Work/Life Balance", "I'm struggling with work-life balance and feeling overwhelmed."),
+    ("👥 Relationship Issues", "I'm having some difficulties in my relationships and need advice."),
+    ("🎯 Goal Setting", "I want to set some mental health goals but don't know where to start."),
+    ("📈 Check Progress", "I'd like to talk about my mental health progress lately.")
+)
+
+def get_quick_responses() -> Tuple[Tuple[str, str], ...]:
     """Get list of quick response options"""
-    return [
-        ("😰 Feeling Anxious", "I'm feeling really anxious right now and could use some support."),
-        ("😢 Feeling Sad", "I've been feeling really sad lately and don't know what to do."),
-        ("💪 Need Motivation", "I'm struggling to find motivation and could use some encouragement."),
-        ("😴 Sleep Issues", "I've been having trouble sleeping and it's affecting my mood."),
-        ("🧘 Want Coping Tips", "Can you share some coping strategies for managing stress?"),
-        ("💬 Just Talk", "I just need someone to talk to about how I'm feeling."),
-        ("🏠 Work/Life Balance", "I'm struggling with work-life balance and feeling overwhelmed."),
-        ("👥 Relationship Issues", "I'm having some difficulties in my relationships and need advice."),
-        ("🎯 Goal Setting", "I want to set some mental health goals but don't know where to start."),
-        ("📈 Check Progress", "I'd like to talk about my mental health progress lately.")
-    ]
+    return _QUICK_RESPONSES
 
-def render_typing_animation() -> str:
-    """Return CSS for typing animation"""
-    return """
+_TYPING_HTML = """
     <style>
     .typing-animation {
         display: inline-block;
@@ -319,6 +371,10 @@ def render_typing_animation() -> str:
     </div>
     """
 
+def render_typing_animation() -> str:
+    """Return CSS for typing animation"""
+    return _TYPING_HTML
+
 def check_browser_compatibility() -> Dict[str, bool]:
     """Check browser compatibility for advanced features"""
     # This is a placeholder - in a real app, you'd use JavaScript
@@ -330,31 +386,38 @@ def check_browser_compatibility() -> Dict[str, bool]:
         "offline_support": False  # Would need service worker
     }
 
-def get_emergency_resources() -> List[Dict[str, str]]:
+_EMERGENCY_RESOURCES: Tuple[Dict[str, str], ...] = (
+    {
+        "name": "National Suicide Prevention Lifeline",
+        "number": "988",
+        "description": "24/7 crisis support",
+        "type": "phone"
+    },
+    {
+        "name": "Crisis Text Line", 
+        "number": "741741",
+        "description": "Text HOME for crisis support",
+        "type": "text"
+    },
+    {
+        "name": "Emergency Services",
+        "number": "911",
+        "description": "For immediate medical emergencies",
+        "type": "emergency"
+    },
+    {
+        "name": "SAMHSA National Helpline",
+        "number": "1-800-662-4357",
+        "description": "Treatment referral and information service",
+        "type": "phone"
+    }
+)
+
+def get_emergency_resources() -> Tuple[Dict[str, str], ...]:
     """Get list of emergency resources"""
-    return [
-        {
-            "name": "National Suicide Prevention Lifeline",
-            "number": "988",
-            "description": "24/7 crisis support",
-            "type": "phone"
-        },
-        {
-            "name": "Crisis Text Line", 
-            "number": "741741",
-            "description": "Text HOME for crisis support",
-            "type": "text"
-        },
-        {
-            "name": "Emergency Services",
-            "number": "911",
-            "description": "For immediate medical emergencies",
-            "type": "emergency"
-        },
-        {
-            "name": "SAMHSA National Helpline",
-            "number": "1-800-662-4357",
-            "description": "Treatment referral and information service",
-            "type": "phone"
-        }
-    ]
\ No newline at end of file
+    return _EMERGENCY_RESOURCES
+
+@st.cache_data(ttl=3600)
+def resource_bullets(resources: tuple) -> str:
+    """A resource list as one markdown bullet list"""
+    return "\n".join(f"- {resource}" for resource in resources)